@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BudgetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'budget'
+
+    def ready(self):
+        # Signal handlers that keep the monthly rollup in step, invalidate
+        # cached reports and tune new database connections
+        from . import db, report_cache, rollups  # noqa: F401
@@ -0,0 +1,278 @@
+# budget/bank_import.py
+
+"""
+Import bank statement exports (CSV or OFX) into a Budget.
+
+The file is parsed as a stream and rows go into the database in chunks
+through rollups.bulk_create_transactions(), so memory stays bounded by
+the chunk size and the rollup and report cache stay in step.
+
+Categories are looked up in a name -> id dict built once per import.
+Duplicates (rows already in the budget, e.g. from importing overlapping
+statements) are found with an in-memory index of hashed
+(date, amount, description) keys. The index is filled with one query per
+chunk, for the dates that chunk is the first to touch. Identical rows
+are told apart by how many times they occur: two identical coffees on
+one day are both imported, and importing the same file again adds
+nothing.
+"""
+
+import codecs
+import csv
+import hashlib
+import re
+from collections import Counter, namedtuple
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models.functions import Lower
+
+from .models import Category, Transaction
+from .rollups import bulk_create_transactions
+
+CHUNK_SIZE = 2000
+MAX_ERRORS = 100
+MAX_AMOUNT = Decimal("99999999.99")  # Transaction.amount: 10 digits, 2 places
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d", "%d.%m.%Y", "%Y%m%d")
+
+# Accepted CSV headers (lower case) for each field
+CSV_COLUMNS = {
+    "date": ("date", "transaction date", "posted date", "posting date", "booking date"),
+    "amount": ("amount", "transaction amount", "value"),
+    "debit": ("debit", "withdrawal", "money out"),
+    "credit": ("credit", "deposit", "money in"),
+    "description": ("description", "memo", "payee", "name", "details", "narrative"),
+    "category": ("category",),
+}
+
+Row = namedtuple("Row", ["line", "date", "amount", "description", "category"])
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.errors = []  # (line, message), at most MAX_ERRORS kept
+        self.error_count = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "duplicates": self.duplicates,
+            "errors": self.error_count,
+            "error_lines": [{"line": line, "error": message} for line, message in self.errors],
+        }
+
+
+# -------------------------------------------
+# PARSING
+# -------------------------------------------
+def _parse_date(value, date_format=None):
+    value = value.strip()
+    if date_format in (None, "%Y-%m-%d") and len(value) == 10:
+        try:
+            return date.fromisoformat(value)  # much faster than strptime
+        except ValueError:
+            pass
+    for fmt in (date_format,) if date_format else DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {value!r}")
+
+
+def _parse_amount(value, blank=False):
+    """The amount in a cell; an empty cell is 0 only if `blank` (split debit/credit columns)."""
+    value = value.strip().replace(",", "").replace("$", "")
+    if not value:
+        if not blank:
+            raise ValueError("missing amount")
+        value = "0"
+    if value.startswith("(") and value.endswith(")"):  # accounting negative
+        value = "-" + value[1:-1]
+    try:
+        amount = Decimal(value).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"unrecognised amount {value!r}")
+    if abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"amount {value} out of range")
+    return amount
+
+
+def _text(stream):
+    """Decode a binary upload lazily (UTF-8, tolerating a BOM)."""
+    return codecs.iterdecode(stream, "utf-8-sig", errors="replace")
+
+
+def parse_csv(stream, result, date_format=None):
+    """Yield a Row per CSV data line; bad lines are recorded in result."""
+    reader = csv.reader(_text(stream))
+    header = [h.strip().lower() for h in next(reader, [])]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if "date" not in columns or not {"amount", "debit", "credit"} & set(columns):
+        raise ValueError("CSV needs a date column and an amount (or debit/credit) column")
+
+    def cell(values, field):
+        i = columns.get(field)
+        return values[i] if i is not None and i < len(values) else ""
+
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        line = reader.line_num
+        try:
+            day = _parse_date(cell(values, "date"), date_format)
+            if "amount" in columns:
+                amount = _parse_amount(cell(values, "amount"))
+            else:
+                credit, debit = cell(values, "credit"), cell(values, "debit")
+                if not credit.strip() and not debit.strip():
+                    raise ValueError("missing amount")
+                amount = _parse_amount(credit, blank=True) - abs(_parse_amount(debit, blank=True))
+        except ValueError as exc:
+            result.error(line, str(exc))
+            continue
+        yield Row(line, day, amount, cell(values, "description").strip(), cell(values, "category").strip())
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def parse_ofx(stream, result, date_format=None):
+    """
+    Yield a Row per <STMTTRN> in an OFX file (SGML or XML flavour),
+    scanning tag by tag.
+    """
+    fields, start_line = None, 0
+    for line_no, text in enumerate(_text(stream), 1):
+        for closing, tag, value in _OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == "STMTTRN" and not closing:
+                fields, start_line = {}, line_no
+            elif tag == "STMTTRN" and closing and fields is not None:
+                try:
+                    day = _parse_date(fields.get("DTPOSTED", "")[:8], "%Y%m%d")
+                    amount = _parse_amount(fields.get("TRNAMT", ""))
+                except ValueError as exc:
+                    result.error(start_line, str(exc))
+                else:
+                    description = fields.get("NAME") or fields.get("MEMO") or ""
+                    yield Row(start_line, day, amount, description, "")
+                fields = None
+            elif fields is not None and not closing and value.strip():
+                fields[tag] = value.strip()
+
+
+PARSERS = {"csv": parse_csv, "ofx": parse_ofx, "qfx": parse_ofx}
+
+
+def detect_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return extension if extension in PARSERS else "csv"
+
+
+# -------------------------------------------
+# DEDUP INDEX
+# -------------------------------------------
+def _key(day, amount, description):
+    raw = f"{day.isoformat()}|{amount}|{' '.join(description.split()).casefold()}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+class DuplicateIndex:
+    """
+    Hashed (date, amount, description) counts for a budget's existing
+    transactions, loaded a set of dates at a time.
+    """
+
+    def __init__(self, budget_id):
+        self.budget_id = budget_id
+        self.existing = Counter()
+        self.seen = Counter()  # occurrences in this import so far
+        self.loaded_dates = set()
+
+    def load(self, dates):
+        dates = set(dates) - self.loaded_dates
+        if not dates:
+            return
+        # A range rather than date__in: a chunk can span more dates than
+        # SQLite allows query parameters
+        rows = Transaction.objects.filter(
+            budget_id=self.budget_id, date__gte=min(dates), date__lte=max(dates)
+        ).values_list("date", "amount", "description")
+        self.existing.update(_key(*row) for row in rows if row[0] in dates)
+        self.loaded_dates |= dates
+
+    def is_duplicate(self, day, amount, description):
+        key = _key(day, amount, description)
+        self.seen[key] += 1
+        return self.seen[key] <= self.existing[key]
+
+
+# -------------------------------------------
+# IMPORT
+# -------------------------------------------
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_statement(budget, stream, fmt="csv", date_format=None, create_categories=False, chunk_size=CHUNK_SIZE):
+    """
+    Import a statement (a binary file-like object or iterable of lines)
+    into `budget`. Returns an ImportResult; raises ValueError if the
+    file isn't a statement at all.
+    """
+    result = ImportResult()
+    categories = dict(
+        Category.objects.filter(budget=budget).annotate(key=Lower("name")).values_list("key", "id")
+    )
+    index = DuplicateIndex(budget.id)
+    rows = PARSERS[fmt](stream, result, date_format)
+
+    for chunk in _chunks(rows, chunk_size):
+        result.rows += len(chunk)
+        index.load(row.date for row in chunk)
+        new = []
+        for row in chunk:
+            if index.is_duplicate(row.date, row.amount, row.description[:255]):
+                result.duplicates += 1
+                continue
+            category_id = None
+            if row.category:
+                key = row.category.lower()[:50]
+                category_id = categories.get(key)
+                if category_id is None and create_categories:
+                    category_id = categories[key] = Category.objects.create(budget=budget, name=row.category[:50]).id
+            new.append(
+                Transaction(
+                    budget_id=budget.id,
+                    category_id=category_id,
+                    date=row.date,
+                    description=row.description[:255],
+                    amount=row.amount,
+                )
+            )
+        bulk_create_transactions(new, batch_size=chunk_size)
+        result.created += len(new)
+    return result
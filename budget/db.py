@@ -0,0 +1,29 @@
+# budget/db.py
+
+"""
+Per-connection SQLite tuning.
+
+Every new SQLite connection runs the PRAGMAs in BUDGET_SQLITE_PRAGMAS
+(set by the "production" database profile in settings.py), e.g. WAL
+journaling so report readers and expense writers stop blocking each
+other. Most of these PRAGMAs only last for the connection, which is why
+they are applied from connection_created rather than once by hand, and
+why the profile also keeps connections open (CONN_MAX_AGE) instead of
+paying for them on every request.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "BUDGET_SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
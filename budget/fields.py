@@ -0,0 +1,66 @@
+# budget/fields.py
+
+"""
+Money stored as integer minor units (cents).
+
+CentsField is a BIGINT column whose Python value is a Decimal with two
+places: Decimal("12.50") is stored as 1250. Sums are integer SUMs in
+SQL and come back as exact Decimals, with no float drift and no
+per-row conversion in Python.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+CENT = Decimal("0.01")
+
+
+class CentsDescriptor(DeferredAttribute):
+    """Normalise on assignment, so instance.amount is always a Decimal."""
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = self.field.to_python(value)
+
+
+class CentsField(models.BigIntegerField):
+    description = "Money amount stored as integer cents"
+    descriptor_class = CentsDescriptor
+
+    def to_python(self, value):
+        if value is None or isinstance(value, models.expressions.Combinable):
+            return value
+        if isinstance(value, Decimal) and value.as_tuple().exponent == -2:
+            return value
+        if isinstance(value, float):
+            value = repr(value)  # 0.1 -> "0.1", not 0.1000000000000000055...
+        try:
+            value = Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+        if not value.is_finite():
+            raise exceptions.ValidationError(
+                self.error_messages["invalid"], code="invalid", params={"value": value}
+            )
+        return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def get_prep_value(self, value):
+        value = self.to_python(value)
+        if value is None or isinstance(value, models.expressions.Combinable):
+            return value
+        return int(value.scaleb(2))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(int(value)).scaleb(-2)
+
+    def formfield(self, **kwargs):
+        return super(models.IntegerField, self).formfield(
+            **{"form_class": forms.DecimalField, "decimal_places": 2, **kwargs}
+        )
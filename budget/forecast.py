@@ -0,0 +1,146 @@
+# budget/forecast.py
+
+"""
+Per-category income and spend forecasts.
+
+monthly_matrix() pulls a budget's history as a (months x categories)
+matrix in one query; fit() models every category at once with NumPy:
+
+  - trend: least-squares line through the whole history
+  - seasonality: average deviation from the trend per calendar month,
+    once there are at least two years of data
+  - level: rolling mean of the last few (deseasonalized) months
+
+forecast() projects the fitted model forward. Only complete months are
+used, so a half-finished current month doesn't drag the level down.
+"""
+
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Transaction
+from .reporting import _next_period, _rollups, _use_rollups
+
+ROLLING_WINDOW = 3
+SEASONAL_MIN_MONTHS = 24
+
+Matrix = namedtuple("Matrix", ["months", "categories", "income", "expense"])
+Fit = namedtuple("Fit", ["last_month", "categories", "level", "trend", "seasonal"])
+
+
+def _rows(budget_id, before):
+    """(month, category name, income, expense) rows, expense positive."""
+    if _use_rollups():
+        return (
+            _rollups(budget_id)
+            .filter(month__lt=before)
+            .values_list("month", "category__name", "income_total", "expense_total")
+        )
+    return (
+        Transaction.objects.filter(budget_id=budget_id, date__lt=before)
+        .annotate(month=TruncMonth("date"))
+        .values("month", "category__name")
+        .annotate(
+            income=Sum("amount", filter=Q(amount__gt=0)),
+            expense=Sum("amount", filter=Q(amount__lt=0)),
+        )
+        .values_list("month", "category__name", "income", "expense")
+        .order_by()
+    )
+
+
+def monthly_matrix(budget_id, as_of=None):
+    """
+    Monthly income and spend per category for every complete month
+    before `as_of` (default today), with empty months filled with zeros.
+    """
+    before = (as_of or date.today()).replace(day=1)
+    rows = [
+        (month, name or "Uncategorized", float(income or 0), -float(expense or 0))
+        for month, name, income, expense in _rows(budget_id, before)
+    ]
+    if not rows:
+        return Matrix([], [], np.zeros((0, 0)), np.zeros((0, 0)))
+
+    categories = sorted({r[1] for r in rows})
+    months = []
+    month = min(r[0] for r in rows)
+    while month < before:
+        months.append(month)
+        month = _next_period(month, "month")
+
+    index = {m: i for i, m in enumerate(months)}
+    column = {c: i for i, c in enumerate(categories)}
+    at = (
+        np.array([index[r[0]] for r in rows], dtype=int),
+        np.array([column[r[1]] for r in rows], dtype=int),
+    )
+    income = np.zeros((len(months), len(categories)))
+    expense = np.zeros((len(months), len(categories)))
+    # add.at, not assignment: two categories may share a name
+    np.add.at(income, at, [r[2] for r in rows])
+    np.add.at(expense, at, [r[3] for r in rows])
+    return Matrix(months, categories, income, expense)
+
+
+def _fit_series(values, calendar):
+    """Fit (level, trend, seasonal) for every column of a months x n array."""
+    count, width = values.shape
+    x = np.arange(count, dtype=float)
+
+    if count >= 2:
+        trend, intercept = np.polyfit(x, values, 1)
+    else:
+        trend, intercept = np.zeros(width), values[0]
+
+    seasonal = np.zeros((12, width))
+    if count >= SEASONAL_MIN_MONTHS:
+        residual = values - (np.outer(x, trend) + intercept)
+        sums = np.zeros((12, width))
+        np.add.at(sums, calendar, residual)
+        seasonal = sums / np.bincount(calendar, minlength=12)[:, None]
+        seasonal -= seasonal.mean(axis=0)
+
+    recent = slice(-ROLLING_WINDOW, None)
+    level = (values[recent] - seasonal[calendar[recent]]).mean(axis=0)
+    # The rolling mean sits at the middle of its window, not at its end
+    level += trend * (min(ROLLING_WINDOW, count) - 1) / 2
+    return level, trend, seasonal
+
+
+def fit(budget_id, as_of=None):
+    """Fit income and spend models for a budget. Returns a Fit, or None with no history."""
+    matrix = monthly_matrix(budget_id, as_of)
+    if not matrix.months:
+        return None
+    calendar = np.array([m.month - 1 for m in matrix.months])
+    # Fit income and spend in one pass: columns are [income..., spend...]
+    level, trend, seasonal = _fit_series(np.hstack([matrix.income, matrix.expense]), calendar)
+    return Fit(matrix.months[-1], matrix.categories, level, trend, seasonal)
+
+
+def forecast(model, horizon=3):
+    """
+    Project a Fit `horizon` months past its history. Returns a list of
+    {"month", "income", "expense"} with per-category lists aligned with
+    model.categories; values are clipped at zero.
+    """
+    width = len(model.categories)
+    steps = np.arange(1, horizon + 1, dtype=float)
+    months = []
+    month = model.last_month
+    for _ in range(horizon):
+        month = _next_period(month, "month")
+        months.append(month)
+    calendar = np.array([m.month - 1 for m in months])
+
+    values = model.level + np.outer(steps, model.trend) + model.seasonal[calendar]
+    values = np.round(np.maximum(values, 0), 2)
+    return [
+        {"month": m, "income": values[i, :width].tolist(), "expense": values[i, width:].tolist()}
+        for i, m in enumerate(months)
+    ]
@@ -0,0 +1,71 @@
+# budget/management/commands/import_bank_statement.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget import bank_import
+from budget.models import Budget
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a bank statement (CSV or OFX) into a budget. Rows already "
+        "in the budget are skipped, so overlapping statements can be "
+        "imported safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("budget", type=int, help="Budget id.")
+        parser.add_argument("path", help="Statement file.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(bank_import.PARSERS),
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--date-format",
+            help="strptime format of the CSV date column (default: try common formats).",
+        )
+        parser.add_argument(
+            "--create-categories",
+            action="store_true",
+            help="Create categories named in the file that the budget doesn't have.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=bank_import.CHUNK_SIZE,
+            help=f"Rows per bulk insert (default {bank_import.CHUNK_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            budget = Budget.objects.get(pk=options["budget"])
+        except Budget.DoesNotExist:
+            raise CommandError(f"No budget with id {options['budget']}")
+
+        fmt = options["format"] or bank_import.detect_format(options["path"])
+        started = time.monotonic()
+        try:
+            with open(options["path"], "rb") as stream:
+                result = bank_import.import_statement(
+                    budget,
+                    stream,
+                    fmt,
+                    date_format=options["date_format"],
+                    create_categories=options["create_categories"],
+                    chunk_size=options["chunk_size"],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.monotonic() - started
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result.rows} rows: {result.created} imported, {result.duplicates} duplicates, "
+                f"{result.error_count} errors in {elapsed:.1f}s"
+            )
+        )
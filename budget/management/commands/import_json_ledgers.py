@@ -0,0 +1,136 @@
+# budget/management/commands/import_json_ledgers.py
+
+import time
+from datetime import datetime, time as dtime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from budget.models import Expense, Income, LedgerImport
+from budget.report_cache import invalidate_expenses
+from budget.storage import iter_usernames, read_user_data
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _income_date(value, default):
+    """JSON ledgers store the income date as 'YYYY-MM-DD' (or nothing)."""
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return default
+    return timezone.make_aware(datetime.combine(day, dtime.min))
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every per-user JSON ledger into the Income/Expense tables. "
+        "Ledgers already imported are skipped, so the command can be "
+        "interrupted and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk_create call (default 1000).",
+        )
+        parser.add_argument(
+            "--files-per-transaction",
+            type=int,
+            default=200,
+            help="Ledgers committed together in one transaction (default 200).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        files_per_tx = options["files_per_transaction"]
+
+        started = time.monotonic()
+        files = skipped = rows = 0
+
+        for usernames in _chunks(iter_usernames(), files_per_tx):
+            done = set(
+                LedgerImport.objects.filter(username__in=usernames).values_list("username", flat=True)
+            )
+            todo = [u for u in usernames if u not in done]
+            skipped += len(done)
+            if todo:
+                rows += self._import_chunk(todo, batch_size)
+                files += len(todo)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{files} ledgers imported, {skipped} skipped, {rows} rows "
+                f"({rows / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {files} ledgers, {rows} rows in {elapsed:.1f}s "
+                f"({rows / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+        )
+
+    @transaction.atomic
+    def _import_chunk(self, usernames, batch_size):
+        """Import a group of ledgers and record them, all or nothing."""
+        users = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        now = timezone.now()
+        incomes, expenses, records = [], [], []
+        rows = 0
+
+        for username in usernames:
+            data = read_user_data(username) or {}
+            record = LedgerImport(username=username)
+
+            for entry in data.get("income", {}).values():
+                incomes.append(
+                    Income(
+                        source=(entry.get("source") or "")[:100],
+                        amount=entry.get("amount") or 0,
+                        date_added=_income_date(entry.get("date"), now),
+                    )
+                )
+                record.incomes += 1
+            for entry in data.get("expenses", []):
+                expenses.append(
+                    Expense(
+                        user_id=users.get(username),
+                        category=(entry.get("category") or "")[:100],
+                        amount=entry.get("amount") or 0,
+                        date=now.date(),
+                    )
+                )
+                record.expenses += 1
+            records.append(record)
+            rows += record.incomes + record.expenses
+
+            # Flush as we go so memory stays bounded by batch_size
+            if len(incomes) >= batch_size:
+                Income.objects.bulk_create(incomes, batch_size=batch_size)
+                incomes = []
+            if len(expenses) >= batch_size:
+                Expense.objects.bulk_create(expenses, batch_size=batch_size)
+                expenses = []
+
+        Income.objects.bulk_create(incomes, batch_size=batch_size)
+        Expense.objects.bulk_create(expenses, batch_size=batch_size)
+        LedgerImport.objects.bulk_create(records, batch_size=batch_size)
+        # bulk_create() sends no signals
+        for user_id in set(users.values()):
+            invalidate_expenses(user_id)
+        return rows
@@ -0,0 +1,93 @@
+# budget/management/commands/rebalance_user_data.py
+
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from budget.storage import (
+    JOURNAL_SUFFIX,
+    LEDGER_SUFFIX,
+    data_root,
+    get_user_file,
+    ledger_cache_clear,
+    ledger_lock,
+)
+
+
+def _ledger_files(path, recursive):
+    """Yield (path, username, suffix) for every ledger or journal file found."""
+    if recursive:
+        for dirpath, _dirnames, filenames in os.walk(path):
+            for name in filenames:
+                yield from _match(dirpath, name)
+    elif os.path.isdir(path):
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    yield from _match(path, entry.name)
+
+
+def _match(dirpath, name):
+    for suffix in (LEDGER_SUFFIX, JOURNAL_SUFFIX):
+        if name.endswith(suffix) and len(name) > len(suffix):
+            yield os.path.join(dirpath, name), name[: -len(suffix)], suffix
+
+
+class Command(BaseCommand):
+    help = (
+        "Move per-user ledger files into the layout configured by "
+        "BUDGET_DATA_ROOT / BUDGET_DATA_SHARD_DEPTH. Run it once after "
+        "changing either setting (or when upgrading from flat files)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            default=None,
+            help=(
+                "Directory holding old flat <username>_data.json files "
+                "(repeatable; defaults to the project directory)."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print what would be moved.",
+        )
+
+    def handle(self, *args, **options):
+        sources = options["source"] or [os.fspath(settings.BASE_DIR)]
+        dry_run = options["dry_run"]
+        root = data_root()
+
+        candidates = [(src, False) for src in sources]
+        # The data root itself may hold files sharded for an older depth
+        candidates.append((root, True))
+
+        moved = skipped = 0
+        for path, recursive in candidates:
+            for current, username, suffix in _ledger_files(path, recursive):
+                target = get_user_file(username, suffix)
+                if os.path.abspath(current) == os.path.abspath(target):
+                    continue
+                if os.path.exists(target):
+                    self.stderr.write(f"Skipping {current}: {target} already exists")
+                    skipped += 1
+                    continue
+
+                self.stdout.write(f"{current} -> {target}")
+                moved += 1
+                if dry_run:
+                    continue
+                with ledger_lock(username):
+                    shutil.move(current, target)
+                stale_lock = current[: -len(suffix)] + LEDGER_SUFFIX + ".lock"
+                if suffix == LEDGER_SUFFIX and os.path.exists(stale_lock):
+                    os.remove(stale_lock)
+
+        ledger_cache_clear()
+        verb = "Would move" if dry_run else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} files ({skipped} skipped)"))
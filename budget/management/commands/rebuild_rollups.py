@@ -0,0 +1,37 @@
+# budget/management/commands/rebuild_rollups.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the monthly budget/category rollup from the raw "
+        "transactions and verify it matches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=int, help="Only this budget id.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the rollup with the raw data; change nothing.",
+        )
+
+    def handle(self, *args, **options):
+        budget_id = options["budget"]
+
+        if not options["check"]:
+            rollups.rebuild(budget_id)
+            self.stdout.write("Rollup rebuilt.")
+
+        mismatches = rollups.check(budget_id)
+        for (budget, month, category), rolled, raw in mismatches:
+            self.stderr.write(
+                f"budget={budget} month={month:%Y-%m} category={category}: "
+                f"rollup={rolled} raw={raw}"
+            )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} rollup rows do not match the raw transactions")
+        self.stdout.write(self.style.SUCCESS("Rollup matches the raw transactions."))
@@ -0,0 +1,62 @@
+# budget/management/commands/sync_replica.py
+
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from budget.report_cache import bump_replica_generation
+from budget.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the read replica file with "
+        "SQLite's online backup API, once or every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Copy into this file instead of the replica database's NAME.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running, syncing every this many seconds (default: sync once).",
+        )
+
+    def _target(self, path):
+        if path:
+            return str(path)
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica database configured; set BUDGET_DB_REPLICA or pass --path")
+        return str(connections[alias].settings_dict["NAME"])
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != "sqlite":
+            raise CommandError("sync_replica only copies SQLite databases")
+        target = self._target(options["path"])
+        if target == str(source.settings_dict["NAME"]):
+            raise CommandError("The replica is the primary database itself; point BUDGET_DB_REPLICA elsewhere")
+
+        while True:
+            started = time.perf_counter()
+            source.ensure_connection()
+            replica = sqlite3.connect(target, timeout=30)
+            try:
+                # One step: a consistent snapshot of the primary, written
+                # into the replica in place so its open readers see it
+                source.connection.backup(replica)
+            finally:
+                replica.close()
+            # Drop whatever was cached from the replica before it caught up
+            bump_replica_generation()
+            self.stdout.write(f"Replica {target} synced in {(time.perf_counter() - started) * 1000:.0f} ms.")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    """Seed the rollup from the transactions that already exist."""
+    Transaction = apps.get_model('budget', 'Transaction')
+    Rollup = apps.get_model('budget', 'BudgetMonthCategoryRollup')
+    rows = (
+        Transaction.objects.exclude(amount=0)
+        .annotate(month=TruncMonth('date'))
+        .values('budget_id', 'month', 'category_id')
+        .annotate(
+            income=Sum('amount', filter=Q(amount__gt=0)),
+            expense=Sum('amount', filter=Q(amount__lt=0)),
+            income_count=Count('id', filter=Q(amount__gt=0)),
+            expense_count=Count('id', filter=Q(amount__lt=0)),
+        )
+        .order_by()
+    )
+    Rollup.objects.bulk_create(
+        [
+            Rollup(
+                budget_id=r['budget_id'],
+                month=r['month'],
+                category_id=r['category_id'],
+                income_total=r['income'] or 0,
+                expense_total=r['expense'] or 0,
+                income_count=r['income_count'],
+                expense_count=r['expense_count'],
+            )
+            for r in rows
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0007_transaction_expense_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetMonthCategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('income_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('income_count', models.PositiveIntegerField(default=0)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budget.budget')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='budget.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('budget', 'month', 'category'), name='rollup_budget_month_category_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
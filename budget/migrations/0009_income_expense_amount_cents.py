@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:59
+
+import budget.fields
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def to_cents(apps, schema_editor):
+    """Scale the float amounts to whole cents before the column becomes an integer."""
+    for name in ('Income', 'Expense'):
+        apps.get_model('budget', name).objects.update(amount=Round(F('amount') * 100))
+
+
+def to_units(apps, schema_editor):
+    for name in ('Income', 'Expense'):
+        apps.get_model('budget', name).objects.update(amount=F('amount') / 100.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0008_budgetmonthcategoryrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_cents, to_units),
+        migrations.AlterField(
+            model_name='expense',
+            name='amount',
+            field=budget.fields.CentsField(),
+        ),
+        migrations.AlterField(
+            model_name='income',
+            name='amount',
+            field=budget.fields.CentsField(),
+        ),
+    ]
@@ -1,14 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .fields import CentsField
+
 # ============================================================
 # Existing Models (Income / Expense)
 # ============================================================
 
 class Income(models.Model):
     source = models.CharField(max_length=100)
-    amount = models.FloatField()
+    amount = CentsField()  # Decimal, stored as integer cents
     date_added = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
@@ -29,7 +31,7 @@ class Expense(models.Model):
         blank=True,
     )
     category = models.CharField(max_length=100)
-    amount = models.FloatField()
+    amount = CentsField()  # Decimal, stored as integer cents
 
     note = models.CharField(max_length=255, blank=True)
     date = models.DateField(default=timezone.now)
@@ -38,10 +40,31 @@ class Expense(models.Model):
     # keep original field for backward compatibility
     date_added = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # list_expenses: one user's expenses in a date range
+            models.Index(fields=["user", "date"], name="expense_user_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.category} - ${self.amount:.2f}"
 
 
+class LedgerImport(models.Model):
+    """
+    One row per JSON ledger copied into Income/Expense by the
+    import_json_ledgers command. Written in the same transaction as the
+    rows themselves, so it doubles as the resume checkpoint.
+    """
+    username = models.CharField(max_length=150, unique=True)
+    incomes = models.PositiveIntegerField(default=0)
+    expenses = models.PositiveIntegerField(default=0)
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.username} ({self.incomes} incomes, {self.expenses} expenses)"
+
+
 # ============================================================
 # Epic 5 Models (Budget / Category / Transaction)
 # ============================================================
@@ -100,5 +123,67 @@ class Transaction(models.Model):
     description = models.CharField(max_length=255, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # reporting.py: a budget's transactions in a date range,
+            # optionally per category
+            models.Index(fields=["budget", "date"], name="txn_budget_date_idx"),
+            models.Index(fields=["budget", "category", "date"], name="txn_budget_cat_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the monthly rollup in the same transaction as the row itself
+        from .rollups import record_transaction_save
+
+        with transaction.atomic():
+            old = None
+            if self.pk is not None:
+                old = (
+                    Transaction.objects.filter(pk=self.pk)
+                    .values("budget_id", "category_id", "date", "amount")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            record_transaction_save(self, old)
+
     def __str__(self):
         return f"{self.date} {self.description} {self.amount}"
+
+
+class BudgetMonthCategoryRollup(models.Model):
+    """
+    Running income/expense totals per budget, month and category.
+
+    Maintained by budget/rollups.py on every Transaction create, update
+    and delete, so reports can read a handful of rollup rows instead of
+    re-aggregating the raw transactions. `python manage.py rebuild_rollups`
+    recomputes and checks it.
+    """
+    budget = models.ForeignKey(
+        Budget,
+        on_delete=models.CASCADE,
+        related_name="rollups",
+    )
+    month = models.DateField()  # first day of the month
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,  # folded into the uncategorized row first
+        null=True,
+        blank=True,
+        related_name="rollups",
+    )
+    income_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # negative
+    income_count = models.PositiveIntegerField(default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "month", "category"],
+                name="rollup_budget_month_category_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.budget_id} {self.month:%Y-%m} {self.category_id}: {self.income_total} / {self.expense_total}"
@@ -0,0 +1,212 @@
+# budget/report_cache.py
+
+"""
+Caching for the reporting.py functions used by views_reports (and the
+expense summary API).
+
+Every budget has a version counter in Django's cache. Cache keys embed
+the current version, and any Transaction or Category change bumps it,
+so invalidation is a single increment no matter how many reports
+were cached, and it is seen by every process that shares the cache.
+Old entries are never deleted; they just stop being asked for and age
+out.
+
+The same counters (and a per-user one for Expense rows) serve as cheap
+ETags, so polling clients get a 304 without any report being computed.
+
+Reads served from the replica (see routers.py) are only as fresh as its
+last sync, so for them the versions also carry the replica's sync
+generation, which sync_replica bumps: a report computed from a replica
+that hadn't caught up yet is dropped by the next sync instead of staying
+cached under the new version.
+"""
+
+import hashlib
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import BaseCache
+from django.core.files import locks
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import reporting, routers
+from .models import Category, Expense, Transaction
+
+HITS_KEY = "report_cache:hits"
+REPLICA_GENERATION_KEY = "replica:generation"
+MISSES_KEY = "report_cache:misses"
+
+# Reports may legitimately be None (e.g. no history to forecast from)
+_MISSING = object()
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1, so a version key that was
+        # evicted can't come back as a number old entries were cached under
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+@contextmanager
+def _counter_lock(directory):
+    # Lock file in the file-based cache's directory (not a .djcache file,
+    # so culling and clear() leave it alone)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "counters.lock"), "wb") as f:
+        locks.lock(f, locks.LOCK_EX)
+        try:
+            yield
+        finally:
+            locks.unlock(f)
+
+
+def _incr(key, start):
+    """
+    Add one to a counter that never expires, or set it to `start`.
+
+    Memcached, Redis and the local-memory cache increment atomically and
+    keep the key's expiry. BaseCache.incr() (the file-based and database
+    caches) is a get() then a set() with the default timeout instead, so
+    there the counter is rewritten with timeout=None, and for the
+    file-based cache under a lock shared by every process.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if type(backend).incr is not BaseCache.incr:
+        try:
+            backend.incr(key)
+        except ValueError:
+            backend.add(key, start, timeout=None)
+        return
+    directory = getattr(backend, "_dir", None)
+    with _counter_lock(directory) if directory else nullcontext():
+        value = backend.get(key)
+        backend.set(key, start if value is None else value + 1, timeout=None)
+
+
+def _bump(key):
+    _incr(key, time.time_ns())
+
+
+def _invalidate(key):
+    # Bump now, and again once the current transaction commits, so a
+    # result computed from the old data in the meantime can't stay
+    # cached under the new version
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def replica_generation():
+    return _version(REPLICA_GENERATION_KEY)
+
+
+def bump_replica_generation():
+    """Called after every replica sync."""
+    _bump(REPLICA_GENERATION_KEY)
+
+
+def _read_version(key):
+    version = _version(key)
+    if routers.reads_from_replica():
+        return f"{version}.r{replica_generation()}"
+    return version
+
+
+def budget_version(budget_id):
+    return _read_version(f"budget:{budget_id}:version")
+
+
+def bump_budget_version(budget_id):
+    _bump(f"budget:{budget_id}:version")
+
+
+def invalidate_budget(budget_id):
+    """Invalidate a budget's cached reports and ETags."""
+    _invalidate(f"budget:{budget_id}:version")
+
+
+def expense_version(user_id):
+    """Version of a user's Expense rows, for ETags on the expense API."""
+    return _read_version(f"user:{user_id}:expenses:version")
+
+
+def invalidate_expenses(user_id):
+    _invalidate(f"user:{user_id}:expenses:version")
+
+
+def _count(key):
+    _incr(key, 1)
+
+
+def stats():
+    """Hit/miss counters, shared by every process using the same cache."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+def _cached(key, compute, *args):
+    result = cache.get(key, _MISSING)
+    if result is not _MISSING:
+        _count(HITS_KEY)
+        return result
+    _count(MISSES_KEY)
+    result = compute(*args)
+    cache.set(key, result, getattr(settings, "BUDGET_REPORT_CACHE_TIMEOUT", 3600))
+    return result
+
+
+def cached_report(name, budget_id, compute, *args):
+    """Return compute(budget_id, *args), cached under the budget's version."""
+    params = ":".join(str(a) for a in args)
+    key = f"report:{name}:{budget_id}:v{budget_version(budget_id)}:{params}"
+    return _cached(key, compute, budget_id, *args)
+
+
+def monthly_kpis(budget_id, year=None, month=None):
+    return cached_report("kpis", budget_id, reporting.monthly_kpis, year, month)
+
+
+def monthly_by_category(budget_id, year=None, month=None):
+    return cached_report("by_category", budget_id, reporting.monthly_by_category, year, month)
+
+
+def recommendations(budget_id, top_n=3, year=None, month=None):
+    return cached_report("recommendations", budget_id, reporting.recommendations, top_n, year, month)
+
+
+def what_if(budget_id, changes, year=None, month=None):
+    # The changes differ per request; only the base KPIs are worth caching
+    base = monthly_kpis(budget_id, year, month)
+    return reporting.what_if(budget_id, changes, year=year, month=month, base=base)
+
+
+def expense_summary(user_id, start, end, group_by="category", categories=()):
+    """reporting.expense_summary, cached under the user's expense version."""
+    categories = sorted(set(categories))
+    # Category names are free text; hash them into something key-safe
+    params = hashlib.blake2b(repr((start, end, group_by, categories)).encode(), digest_size=16).hexdigest()
+    key = f"expense_summary:{user_id}:v{expense_version(user_id)}:{params}"
+    return _cached(key, reporting.expense_summary, user_id, start, end, group_by, categories)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def _budget_changed(sender, instance, **kwargs):
+    invalidate_budget(instance.budget_id)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+def _expenses_changed(sender, instance, **kwargs):
+    invalidate_expenses(instance.user_id)
@@ -1,12 +1,17 @@
 # budget/reporting.py
 
+from collections import namedtuple
 from decimal import Decimal
 from calendar import monthrange
-from datetime import date
+from datetime import date, timedelta
 
-from django.db.models import Sum
+import numpy as np
 
-from .models import Transaction
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import BudgetMonthCategoryRollup, Expense, Transaction
 
 
 def _month_bounds(year, month):
@@ -15,6 +20,44 @@ def _month_bounds(year, month):
     return date(year, month, 1), date(year, month, last)
 
 
+def month_range(year, month):
+    """
+    Half-open (start, stop) for a month: filter with date__gte=start,
+    date__lt=stop. Unlike date__year/date__month, which SQLite evaluates
+    as a function call per row, a plain range can use a date index.
+    ValueError for December 9999, which has no date to stop at.
+    """
+    start, end = _month_bounds(year, month)
+    if end == date.max:
+        raise ValueError("month out of range")
+    return start, end + timedelta(days=1)
+
+
+_INCOME_EXPENSE = {
+    "income": Sum("amount", filter=Q(amount__gt=0)),
+    "expense": Sum("amount", filter=Q(amount__lt=0)),
+}
+
+
+def _use_rollups():
+    """
+    Read month/category totals from BudgetMonthCategoryRollup (kept up
+    to date by budget/rollups.py) instead of re-aggregating Transaction.
+    """
+    return getattr(settings, "BUDGET_USE_ROLLUPS", True)
+
+
+def _rollups_for(budget_ids, year=None, month=None):
+    qs = BudgetMonthCategoryRollup.objects.filter(budget_id__in=budget_ids)
+    if year is not None and month is not None:
+        qs = qs.filter(month=date(year, month, 1))
+    return qs
+
+
+def _rollups(budget_id, year=None, month=None):
+    return _rollups_for([budget_id], year, month)
+
+
 def monthly_kpis(budget_id, year=None, month=None):
     """
     Total income, total expense, and net for a budget.
@@ -23,15 +66,22 @@ def monthly_kpis(budget_id, year=None, month=None):
     If not given -> use ALL transactions for that budget.
     Positive amount = income, negative amount = expense.
     """
-    qs = Transaction.objects.filter(budget_id=budget_id)
-
     start = end = None
     if year is not None and month is not None:
         start, end = _month_bounds(year, month)
-        qs = qs.filter(date__year=year, date__month=month)
 
-    income = qs.filter(amount__gt=0).aggregate(s=Sum("amount"))["s"] or Decimal("0")
-    expense = qs.filter(amount__lt=0).aggregate(s=Sum("amount"))["s"] or Decimal("0")
+    if _use_rollups():
+        totals = _rollups(budget_id, year, month).aggregate(
+            income=Sum("income_total"), expense=Sum("expense_total")
+        )
+    else:
+        qs = Transaction.objects.filter(budget_id=budget_id)
+        if start is not None:
+            qs = qs.filter(date__gte=start, date__lt=month_range(year, month)[1])
+        # One query: income and expense are conditional sums over the same rows
+        totals = qs.aggregate(**_INCOME_EXPENSE)
+    income = totals["income"] or Decimal("0")
+    expense = totals["expense"] or Decimal("0")
     net = income + expense
 
     return {
@@ -43,6 +93,110 @@ def monthly_kpis(budget_id, year=None, month=None):
     }
 
 
+_TRUNC = {"month": TruncMonth, "week": TruncWeek, "day": TruncDay}
+
+
+def _period_start(day, granularity):
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+    return day
+
+
+def _next_period(day, granularity):
+    if granularity == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if granularity == "week":
+        return day + timedelta(days=7)
+    return day + timedelta(days=1)
+
+
+def _periods(start, end, granularity):
+    """
+    The first day of every period from `start` to `end` (inclusive),
+    stopping at the last period that starts before date.max.
+    """
+    period = _period_start(start, granularity)
+    while period <= end:
+        yield period
+        try:
+            period = _next_period(period, granularity)
+        except OverflowError:
+            return
+
+
+def kpi_series(budget_id, start, end, granularity="month"):
+    """
+    Income, expense and net for every month, week or day from `start`
+    to `end` (inclusive), computed with a single GROUP BY query.
+
+    Periods are labelled by their first day (weeks start on Monday) and
+    periods without transactions are included with zeros, so the result
+    can be charted directly.
+    """
+    if granularity not in _TRUNC:
+        raise ValueError(f"granularity must be one of {sorted(_TRUNC)}")
+
+    rows = (
+        Transaction.objects.filter(budget_id=budget_id, date__gte=start, date__lte=end)
+        .annotate(period=_TRUNC[granularity]("date"))
+        .values("period")
+        .annotate(**_INCOME_EXPENSE)
+        .order_by("period")
+    )
+    by_period = {r["period"]: r for r in rows}
+
+    series = []
+    for period in _periods(start, end, granularity):
+        r = by_period.get(period, {})
+        income = r.get("income") or Decimal("0")
+        expense = r.get("expense") or Decimal("0")
+        series.append({"period": period, "income": income, "expense": expense, "net": income + expense})
+    return series
+
+
+SUMMARY_GROUPS = ("category", *_TRUNC)
+
+
+def expense_summary(user_id, start, end, group_by="category", categories=()):
+    """
+    A user's Expense totals and counts from `start` to `end` (inclusive),
+    grouped by category (largest first) or by day, week or month (every
+    period, zeros included, labelled by its first day). One GROUP BY
+    query; the totals are integer sums of cents, returned as Decimals.
+    """
+    if group_by not in SUMMARY_GROUPS:
+        raise ValueError(f"group_by must be one of {list(SUMMARY_GROUPS)}")
+
+    qs = Expense.objects.filter(user_id=user_id, date__gte=start, date__lte=end)
+    if categories:
+        qs = qs.filter(category__in=categories)
+    if group_by == "category":
+        qs = qs.annotate(key=F("category"))
+    else:
+        qs = qs.annotate(key=_TRUNC[group_by]("date"))
+    rows = qs.values("key").annotate(total=Sum("amount"), count=Count("id")).values_list("key", "total", "count")
+
+    if group_by == "category":
+        groups = [
+            {"key": key, "total": total, "count": count}
+            for key, total, count in sorted(rows, key=lambda r: (-r[1], r[0]))
+        ]
+    else:
+        by_period = {key: (total, count) for key, total, count in rows}
+        groups = []
+        for period in _periods(start, end, group_by):
+            total, count = by_period.get(period, (Decimal("0.00"), 0))
+            groups.append({"key": period, "total": total, "count": count})
+
+    return {
+        "total": sum((g["total"] for g in groups), Decimal("0.00")),
+        "count": sum(g["count"] for g in groups),
+        "groups": groups,
+    }
+
+
 def monthly_by_category(budget_id, year=None, month=None):
     """
     Expense-only breakdown (absolute values) per category for charts.
@@ -50,16 +204,26 @@ def monthly_by_category(budget_id, year=None, month=None):
     If year/month given -> that month only.
     If not -> all transactions.
     """
-    qs = Transaction.objects.filter(budget_id=budget_id, amount__lt=0)
+    if _use_rollups():
+        rows = (
+            _rollups(budget_id, year, month)
+            .filter(expense_count__gt=0)
+            .values("category__name")
+            .annotate(total=Sum("expense_total"))
+            .order_by("category__name")
+        )
+    else:
+        qs = Transaction.objects.filter(budget_id=budget_id, amount__lt=0)
 
-    if year is not None and month is not None:
-        qs = qs.filter(date__year=year, date__month=month)
+        if year is not None and month is not None:
+            start, stop = month_range(year, month)
+            qs = qs.filter(date__gte=start, date__lt=stop)
 
-    rows = (
-        qs.values("category__name")
-        .annotate(total=Sum("amount"))
-        .order_by("category__name")
-    )
+        rows = (
+            qs.values("category__name")
+            .annotate(total=Sum("amount"))
+            .order_by("category__name")
+        )
 
     result = []
     for r in rows:
@@ -70,11 +234,50 @@ def monthly_by_category(budget_id, year=None, month=None):
     return result
 
 
-def recommendations(budget_id, top_n=3, year=None, month=None):
+Pivot = namedtuple("Pivot", ["months", "categories", "values"])
+
+
+def category_month_matrix(budget_id, months=12, end=None):
     """
-    Return recommendation dicts for the top N expense categories.
+    Expense totals (positive) per category for the `months` months up to
+    and including the month of `end` (default today), as a Pivot whose
+    values is a (categories x months) NumPy array. Empty months are zeros.
+    Built from one GROUP BY (category, month) query read as tuples.
     """
-    cats = monthly_by_category(budget_id, year=year, month=month)
+    last = (end or date.today()).replace(day=1)
+    window = [last]
+    for _ in range(months - 1):
+        window.insert(0, (window[0] - timedelta(days=1)).replace(day=1))
+    stop = _next_period(last, "month")
+
+    if _use_rollups():
+        rows = (
+            _rollups(budget_id)
+            .filter(month__gte=window[0], month__lt=stop, expense_count__gt=0)
+            .values_list("category__name", "month", "expense_total")
+        )
+    else:
+        rows = (
+            Transaction.objects.filter(budget_id=budget_id, amount__lt=0, date__gte=window[0], date__lt=stop)
+            .annotate(month=TruncMonth("date"))
+            .values("category__name", "month")
+            .annotate(total=Sum("amount"))
+            .values_list("category__name", "month", "total")
+        )
+    rows = list(rows.order_by())
+    if not rows:
+        return Pivot(window, [], np.zeros((0, months)))
+
+    names, days, totals = zip(*rows)
+    names = ["Uncategorized" if n is None else n for n in names]
+    categories, cat_index = np.unique(names, return_inverse=True)
+    month_index = {m: i for i, m in enumerate(window)}
+    values = np.zeros((len(categories), months))
+    np.add.at(values, (cat_index, [month_index[d] for d in days]), np.abs(np.array(totals, dtype=float)))
+    return Pivot(window, categories.tolist(), values)
+
+
+def _recommend(cats, top_n):
     cats_sorted = sorted(cats, key=lambda x: x["total"], reverse=True)
 
     recs = []
@@ -91,14 +294,130 @@ def recommendations(budget_id, top_n=3, year=None, month=None):
     return recs
 
 
-def what_if(budget_id, changes, year=None, month=None):
+def recommendations(budget_id, top_n=3, year=None, month=None):
+    """
+    Return recommendation dicts for the top N expense categories.
+    """
+    return _recommend(monthly_by_category(budget_id, year=year, month=month), top_n)
+
+
+# -------------------------------------------
+# SEVERAL BUDGETS AT ONCE
+# -------------------------------------------
+def monthly_kpis_by_budget(budget_ids, year=None, month=None):
+    """
+    monthly_kpis() for several budgets in one GROUP BY query.
+    Returns {budget_id: kpis}; budgets without transactions get zeros.
+    """
+    start = end = None
+    if year is not None and month is not None:
+        start, end = _month_bounds(year, month)
+
+    if _use_rollups():
+        rows = (
+            _rollups_for(budget_ids, year, month)
+            .values("budget_id")
+            .annotate(income=Sum("income_total"), expense=Sum("expense_total"))
+        )
+    else:
+        qs = Transaction.objects.filter(budget_id__in=budget_ids)
+        if start is not None:
+            qs = qs.filter(date__gte=start, date__lt=month_range(year, month)[1])
+        rows = qs.values("budget_id").annotate(**_INCOME_EXPENSE)
+    totals = {r["budget_id"]: r for r in rows.order_by()}
+
+    result = {}
+    for budget_id in budget_ids:
+        r = totals.get(budget_id, {})
+        income = r.get("income") or Decimal("0")
+        expense = r.get("expense") or Decimal("0")
+        result[budget_id] = {"start": start, "end": end, "income": income, "expense": expense, "net": income + expense}
+    return result
+
+
+def monthly_by_category_by_budget(budget_ids, year=None, month=None):
+    """
+    monthly_by_category() for several budgets in one GROUP BY query.
+    Returns {budget_id: rows}.
+    """
+    if _use_rollups():
+        rows = (
+            _rollups_for(budget_ids, year, month)
+            .filter(expense_count__gt=0)
+            .values("budget_id", "category__name")
+            .annotate(total=Sum("expense_total"))
+        )
+    else:
+        qs = Transaction.objects.filter(budget_id__in=budget_ids, amount__lt=0)
+        if year is not None and month is not None:
+            start, stop = month_range(year, month)
+            qs = qs.filter(date__gte=start, date__lt=stop)
+        rows = qs.values("budget_id", "category__name").annotate(total=Sum("amount"))
+
+    result = {budget_id: [] for budget_id in budget_ids}
+    for r in rows.order_by("budget_id", "category__name"):
+        result[r["budget_id"]].append(
+            {"category": r["category__name"] or "Uncategorized", "total": abs(Decimal(r["total"]))}
+        )
+    return result
+
+
+def recommendations_by_budget(budget_ids, top_n=3, year=None, month=None, by_category=None):
+    """
+    recommendations() for several budgets from one category query
+    (or from `by_category`, if the caller already has it).
+    """
+    if by_category is None:
+        by_category = monthly_by_category_by_budget(budget_ids, year=year, month=month)
+    return {budget_id: _recommend(by_category[budget_id], top_n) for budget_id in budget_ids}
+
+
+def household_report(budget_ids, top_n=3, year=None, month=None):
+    """
+    Per-budget KPIs, category spend and recommendations, plus the same
+    for all the budgets combined, in two queries.
+    """
+    kpis = monthly_kpis_by_budget(budget_ids, year=year, month=month)
+    by_category = monthly_by_category_by_budget(budget_ids, year=year, month=month)
+
+    combined_totals = {}
+    for rows in by_category.values():
+        for row in rows:
+            combined_totals[row["category"]] = combined_totals.get(row["category"], Decimal("0")) + row["total"]
+    combined_cats = [{"category": name, "total": combined_totals[name]} for name in sorted(combined_totals)]
+
+    income = sum((k["income"] for k in kpis.values()), Decimal("0"))
+    expense = sum((k["expense"] for k in kpis.values()), Decimal("0"))
+    start = end = None
+    if year is not None and month is not None:
+        start, end = _month_bounds(year, month)
+
+    return {
+        "budgets": {
+            budget_id: {
+                "kpis": kpis[budget_id],
+                "by_category": by_category[budget_id],
+                "recommendations": _recommend(by_category[budget_id], top_n),
+            }
+            for budget_id in budget_ids
+        },
+        "combined": {
+            "kpis": {"start": start, "end": end, "income": income, "expense": expense, "net": income + expense},
+            "by_category": combined_cats,
+            "recommendations": _recommend(combined_cats, top_n),
+        },
+    }
+
+
+def what_if(budget_id, changes, year=None, month=None, base=None):
     """
     Simple what-if: apply signed deltas to the current net.
 
     changes: list of {"category": str, "delta": number}
     (We don't use category in logic; we just sum deltas.)
+    base: the month's KPIs, if the caller already has them
     """
-    kpi = monthly_kpis(budget_id, year=year, month=month)
+    kpi = base if base is not None else monthly_kpis(budget_id, year=year, month=month)
     delta_total = sum(Decimal(str(c.get("delta", 0))) for c in changes)
     projected = kpi["net"] + delta_total
     return {"base": kpi, "delta": delta_total, "projected_net": projected}
@@ -0,0 +1,279 @@
+# budget/rollups.py
+
+"""
+Maintenance of BudgetMonthCategoryRollup.
+
+Single-row changes are handled automatically:
+  - Transaction.save() calls record_transaction_save() in its transaction
+  - deletes (instance.delete() and queryset.delete()) go through the
+    post_delete signal, which Django sends inside the delete transaction
+  - deleting a Category folds its rollups into the uncategorized row,
+    mirroring the SET_NULL on Transaction.category
+
+QuerySet.bulk_create() and QuerySet.update() send no signals, so bulk
+writes must go through bulk_create_transactions() / update_transactions(),
+which also invalidate the affected budgets' cached reports.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date
+
+from .models import Budget, BudgetMonthCategoryRollup, Category, Transaction
+from .report_cache import invalidate_budget
+
+ZERO = Decimal("0")
+
+
+def _month(day):
+    if isinstance(day, str):
+        day = parse_date(day)
+    return day.replace(day=1)
+
+
+def _delta(amount, sign=1):
+    """(income, expense, income_count, expense_count) for one transaction."""
+    amount = Decimal(str(amount))
+    if amount > 0:
+        return (sign * amount, ZERO, sign, 0)
+    if amount < 0:
+        return (ZERO, sign * amount, 0, sign)
+    return (ZERO, ZERO, 0, 0)
+
+
+def _apply(budget_id, month, category_id, income, expense, income_count, expense_count):
+    """Add a delta to one rollup row, creating it if needed."""
+    if not (income or expense or income_count or expense_count):
+        return
+    rows = BudgetMonthCategoryRollup.objects.filter(
+        budget_id=budget_id, month=month, category_id=category_id
+    )
+    updated = rows.update(
+        income_total=F("income_total") + income,
+        expense_total=F("expense_total") + expense,
+        income_count=F("income_count") + income_count,
+        expense_count=F("expense_count") + expense_count,
+    )
+    if not updated and (income_count > 0 or expense_count > 0):
+        BudgetMonthCategoryRollup.objects.create(
+            budget_id=budget_id,
+            month=month,
+            category_id=category_id,
+            income_total=income,
+            expense_total=expense,
+            income_count=income_count,
+            expense_count=expense_count,
+        )
+
+
+def _apply_all(deltas):
+    for (budget_id, month, category_id), d in deltas.items():
+        _apply(budget_id, month, category_id, *d)
+
+
+def _add(deltas, key, delta):
+    current = deltas[key]
+    deltas[key] = tuple(a + b for a, b in zip(current, delta))
+
+
+def _new_deltas():
+    return defaultdict(lambda: (ZERO, ZERO, 0, 0))
+
+
+def record_transaction_save(txn, old=None):
+    """
+    Update the rollup for a saved transaction. `old` is the row's
+    previous (budget_id, category_id, date, amount) values, if any.
+    """
+    deltas = _new_deltas()
+    if old is not None:
+        _add(deltas, (old["budget_id"], _month(old["date"]), old["category_id"]), _delta(old["amount"], -1))
+    _add(deltas, (txn.budget_id, _month(txn.date), txn.category_id), _delta(txn.amount))
+    _apply_all(deltas)
+
+
+@receiver(post_delete, sender=Transaction)
+def _transaction_deleted(sender, instance, **kwargs):
+    income, expense, income_count, expense_count = _delta(instance.amount, -1)
+    BudgetMonthCategoryRollup.objects.filter(
+        budget_id=instance.budget_id,
+        month=_month(instance.date),
+        category_id=instance.category_id,
+    ).update(
+        income_total=F("income_total") + income,
+        expense_total=F("expense_total") + expense,
+        income_count=F("income_count") + income_count,
+        expense_count=F("expense_count") + expense_count,
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def _category_deleted(sender, instance, origin=None, **kwargs):
+    # Its transactions are about to become uncategorized (SET_NULL);
+    # the category's own rollup rows go away with it (CASCADE). When the
+    # whole budget is being deleted there is nothing to keep.
+    origin_model = getattr(origin, "model", type(origin))
+    if origin is not None and origin_model is not Category:
+        return
+    for row in BudgetMonthCategoryRollup.objects.filter(category=instance):
+        _apply(
+            row.budget_id,
+            row.month,
+            None,
+            row.income_total,
+            row.expense_total,
+            row.income_count,
+            row.expense_count,
+        )
+
+
+# -------------------------------------------
+# BULK HELPERS
+# -------------------------------------------
+_GROUPED = {
+    "income": Sum("amount", filter=Q(amount__gt=0)),
+    "expense": Sum("amount", filter=Q(amount__lt=0)),
+    "income_count": Count("id", filter=Q(amount__gt=0)),
+    "expense_count": Count("id", filter=Q(amount__lt=0)),
+}
+
+
+def _grouped(queryset):
+    """Rollup-shaped totals for a Transaction queryset, in one GROUP BY."""
+    return (
+        # $0.00 transactions count as neither income nor expense; left in,
+        # they would make all-zero groups the rollup never stores
+        queryset.exclude(amount=0)
+        .annotate(month=TruncMonth("date"))
+        .values("budget_id", "month", "category_id")
+        .annotate(**_GROUPED)
+        .order_by()
+    )
+
+
+def _grouped_deltas(queryset, sign):
+    deltas = _new_deltas()
+    for r in _grouped(queryset):
+        _add(
+            deltas,
+            (r["budget_id"], r["month"], r["category_id"]),
+            (
+                sign * (r["income"] or ZERO),
+                sign * (r["expense"] or ZERO),
+                sign * r["income_count"],
+                sign * r["expense_count"],
+            ),
+        )
+    return deltas
+
+
+def bulk_create_transactions(transactions, batch_size=None):
+    """Transaction.objects.bulk_create() that keeps the rollup in step."""
+    transactions = list(transactions)
+    deltas = _new_deltas()
+    for txn in transactions:
+        _add(deltas, (txn.budget_id, _month(txn.date), txn.category_id), _delta(txn.amount))
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        _apply_all(deltas)
+        for budget_id in {key[0] for key in deltas}:
+            invalidate_budget(budget_id)
+    return created
+
+
+def update_transactions(queryset, **fields):
+    """queryset.update(**fields) that keeps the rollup in step."""
+    with transaction.atomic():
+        ids = list(queryset.values_list("pk", flat=True))
+        total = 0
+        budgets = set()
+        for start in range(0, len(ids), 500):
+            chunk = Transaction.objects.filter(pk__in=ids[start:start + 500])
+            deltas = _grouped_deltas(chunk, -1)
+            total += chunk.update(**fields)
+            for key, delta in _grouped_deltas(chunk, 1).items():
+                _add(deltas, key, delta)
+            _apply_all(deltas)
+            budgets.update(key[0] for key in deltas)
+        for budget_id in budgets:
+            invalidate_budget(budget_id)
+        return total
+
+
+# -------------------------------------------
+# REBUILD / CHECK
+# -------------------------------------------
+def _raw_totals(budget_id=None):
+    qs = Transaction.objects.all()
+    if budget_id is not None:
+        qs = qs.filter(budget_id=budget_id)
+    return {
+        (r["budget_id"], r["month"], r["category_id"]): (
+            r["income"] or ZERO,
+            r["expense"] or ZERO,
+            r["income_count"],
+            r["expense_count"],
+        )
+        for r in _grouped(qs)
+    }
+
+
+def _rollup_totals(budget_id=None):
+    qs = BudgetMonthCategoryRollup.objects.all()
+    if budget_id is not None:
+        qs = qs.filter(budget_id=budget_id)
+    totals = _new_deltas()
+    for r in qs.values_list(
+        "budget_id", "month", "category_id",
+        "income_total", "expense_total", "income_count", "expense_count",
+    ):
+        _add(totals, r[:3], r[3:])
+    # Rows emptied by deletes are harmless; ignore them when comparing
+    return {k: v for k, v in totals.items() if any(v)}
+
+
+def check(budget_id=None):
+    """
+    Compare the rollup with the raw transactions. Returns a list of
+    (key, rollup_totals, raw_totals) for every mismatch.
+    """
+    raw = _raw_totals(budget_id)
+    rolled = _rollup_totals(budget_id)
+    return [
+        (key, rolled.get(key), raw.get(key))
+        for key in sorted(set(raw) | set(rolled), key=str)
+        if rolled.get(key) != raw.get(key)
+    ]
+
+
+def rebuild(budget_id=None):
+    """Recompute the rollup from scratch (for one budget, or all)."""
+    with transaction.atomic():
+        rows = BudgetMonthCategoryRollup.objects.all()
+        if budget_id is not None:
+            rows = rows.filter(budget_id=budget_id)
+        rows.delete()
+        BudgetMonthCategoryRollup.objects.bulk_create(
+            [
+                BudgetMonthCategoryRollup(
+                    budget_id=b,
+                    month=m,
+                    category_id=c,
+                    income_total=income,
+                    expense_total=expense,
+                    income_count=income_count,
+                    expense_count=expense_count,
+                )
+                for (b, m, c), (income, expense, income_count, expense_count) in _raw_totals(budget_id).items()
+            ],
+            batch_size=500,
+        )
+        budgets = [budget_id] if budget_id is not None else Budget.objects.values_list("id", flat=True)
+        for b in budgets:
+            invalidate_budget(b)
@@ -0,0 +1,139 @@
+# budget/routers.py
+
+"""
+Read/write splitting between the primary database and a read replica.
+
+Everything is written to the primary. Reads go to the replica
+(BUDGET_REPLICA_DATABASE) only inside views wrapped in replica_reads()
+-- the report and listing endpoints -- and only for this app's tables;
+sessions and users always come from the primary.
+
+The replica lags behind the primary until the next sync_replica, so
+whoever has just written reads their own writes from the primary for a
+while: any write to this app's tables during a request sets a signed
+cookie that pins the client to the primary for
+BUDGET_REPLICA_PIN_SECONDS. The pin travels with the client, so every
+worker process honours it. replica_request_middleware makes the request
+visible to the router and sets the cookie. (For everyone else,
+report_cache ties cache keys and ETags to the replica's sync generation.)
+
+Locally, point BUDGET_DB_REPLICA at a second SQLite file and keep it in
+sync with `python manage.py sync_replica`.
+"""
+
+import functools
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+APP_LABEL = "budget"
+
+# The request being handled, and the alias its budget reads go to
+_request = ContextVar("budget_request", default=None)
+_read_alias = ContextVar("budget_read_alias", default=None)
+
+
+def replica_alias():
+    """The replica's alias, or None when no replica is configured."""
+    return getattr(settings, "BUDGET_REPLICA_DATABASE", None)
+
+
+PIN_COOKIE = "budget_replica_pin"
+
+
+def _pin_seconds():
+    return getattr(settings, "BUDGET_REPLICA_PIN_SECONDS", 15)
+
+
+def is_pinned(request):
+    """Has this client written within the last BUDGET_REPLICA_PIN_SECONDS?"""
+    return bool(request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=_pin_seconds()))
+
+
+def _set_pin(request, response):
+    if getattr(request, "_replica_pinned", False):
+        response.set_signed_cookie(
+            PIN_COOKIE, "1", salt=PIN_COOKIE, max_age=_pin_seconds(), httponly=True, samesite="Lax"
+        )
+    return response
+
+
+def reads_from_replica():
+    """Is this request's budget data being read from the replica?"""
+    return _read_alias.get() is not None
+
+
+def _read_alias_for(request):
+    alias = replica_alias()
+    return None if alias is None or is_pinned(request) else alias
+
+
+def replica_reads(view):
+    """Serve this view's reads from the replica, unless the client is pinned."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _read_alias.set(_read_alias_for(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _read_alias.set(_read_alias_for(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+    return wrapper
+
+
+@sync_and_async_middleware
+def replica_request_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _request.set(request)
+            try:
+                return _set_pin(request, await get_response(request))
+            finally:
+                _request.reset(token)
+    else:
+        def middleware(request):
+            token = _request.set(request)
+            try:
+                return _set_pin(request, get_response(request))
+            finally:
+                _request.reset(token)
+    return middleware
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == APP_LABEL:
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == APP_LABEL and replica_alias():
+            request = _request.get()
+            if request is not None:
+                request._replica_pinned = True  # the middleware sets the cookie
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary, so rows from either can
+        # be related
+        alias = replica_alias()
+        if alias and {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, alias}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema along with its data from the primary
+        if db == replica_alias():
+            return False
+        return None
@@ -0,0 +1,168 @@
+# budget/scenarios.py
+
+"""
+Batch what-if engine.
+
+load_baseline() reads a budget's per-category income and spend once;
+evaluate() then projects any number of scenarios against it as NumPy
+array operations, one row per scenario and one column per category.
+
+A scenario looks like:
+
+    {
+        "name": "tighten food",            # optional
+        "months": 3,                        # horizon, default 1, at most MAX_MONTHS
+        "changes": [
+            {"category": "Food", "percent": -10},   # spend 10% less
+            {"category": "Rent", "amount": 25},     # spend 25 more a month
+            {"category": "Misc", "cap": 100},       # spend at most 100 a month
+        ],
+    }
+
+percent and amount are applied first, then the cap; spend never goes
+below zero. Income is left as it is.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from django.db.models import Q, Sum
+
+from .models import Transaction
+from .reporting import _rollups, _use_rollups, month_range
+
+Baseline = namedtuple("Baseline", ["categories", "income", "expense"])
+
+# Longest horizon a scenario may project over (ten years)
+MAX_MONTHS = 120
+
+
+def load_baseline(budget_id, year=None, month=None):
+    """
+    Per-category income and spend (both positive) for one month, or for
+    all time when no month is given, as aligned NumPy arrays.
+    """
+    if _use_rollups():
+        rows = (
+            _rollups(budget_id, year, month)
+            .values("category__name")
+            .annotate(income=Sum("income_total"), expense=Sum("expense_total"))
+        )
+    else:
+        qs = Transaction.objects.filter(budget_id=budget_id)
+        if year is not None and month is not None:
+            start, stop = month_range(year, month)
+            qs = qs.filter(date__gte=start, date__lt=stop)
+        rows = qs.values("category__name").annotate(
+            income=Sum("amount", filter=Q(amount__gt=0)),
+            expense=Sum("amount", filter=Q(amount__lt=0)),
+        )
+
+    totals = {}
+    for r in rows.order_by():
+        name = r["category__name"] or "Uncategorized"
+        income, expense = totals.get(name, (0.0, 0.0))
+        totals[name] = (income + float(r["income"] or 0), expense - float(r["expense"] or 0))
+
+    categories = sorted(totals)
+    return Baseline(
+        categories=categories,
+        income=np.array([totals[c][0] for c in categories], dtype=float),
+        expense=np.array([totals[c][1] for c in categories], dtype=float),
+    )
+
+
+def _number(value, field, index):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"scenario {index}: {field} must be a number")
+    if not np.isfinite(number):
+        raise ValueError(f"scenario {index}: {field} must be finite")
+    return number
+
+
+def _matrices(baseline, scenarios):
+    """Turn scenario dicts into (scale, amount, cap, months) arrays."""
+    column = {name: i for i, name in enumerate(baseline.categories)}
+    shape = (len(scenarios), len(column))
+    scale = np.ones(shape)
+    amount = np.zeros(shape)
+    cap = np.full(shape, np.inf)
+    months = np.ones(len(scenarios))
+
+    for s, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"scenario {s}: must be an object")
+        months[s] = _number(scenario.get("months", 1), "months", s)
+        if not 1 <= months[s] <= MAX_MONTHS or months[s] != int(months[s]):
+            raise ValueError(f"scenario {s}: months must be a whole number from 1 to {MAX_MONTHS}")
+        changes = scenario.get("changes", [])
+        if not isinstance(changes, list):
+            raise ValueError(f"scenario {s}: changes must be a list")
+        for change in changes:
+            if not isinstance(change, dict):
+                raise ValueError(f"scenario {s}: changes must be objects")
+            if not isinstance(change.get("category"), str):
+                raise ValueError(f"scenario {s}: category must be a string")
+            c = column.get(change["category"])
+            if c is None:
+                raise ValueError(f"scenario {s}: unknown category {change.get('category')!r}")
+            if "percent" in change:
+                scale[s, c] *= 1 + _number(change["percent"], "percent", s) / 100
+            if "amount" in change:
+                amount[s, c] += _number(change["amount"], "amount", s)
+            if "cap" in change:
+                cap[s, c] = min(cap[s, c], _number(change["cap"], "cap", s))
+    return scale, amount, cap, months
+
+
+def evaluate(baseline, scenarios):
+    """
+    Project every scenario against the baseline. Returns a dict of
+    arrays: expense is (scenarios x categories) over each scenario's
+    horizon; income, projected_net and delta have one value per scenario.
+    """
+    scale, amount, cap, months = _matrices(baseline, scenarios)
+
+    monthly = np.minimum(np.maximum(baseline.expense * scale + amount, 0), cap)
+    expense = monthly * months[:, None]
+    income = baseline.income.sum() * months
+    projected_net = income - expense.sum(axis=1)
+    base_net = (baseline.income.sum() - baseline.expense.sum()) * months
+    return {
+        "months": months,
+        "expense": expense,
+        "income": income,
+        "projected_net": projected_net,
+        "delta": projected_net - base_net,
+    }
+
+
+def run_scenarios(baseline, scenarios):
+    """evaluate() shaped for a JSON response (money rounded to cents)."""
+    result = evaluate(baseline, scenarios)
+    expense = np.round(result["expense"], 2).tolist()
+    projected_net = np.round(result["projected_net"], 2).tolist()
+    delta = np.round(result["delta"], 2).tolist()
+    income = np.round(result["income"], 2).tolist()
+
+    return {
+        "categories": baseline.categories,
+        "base": {
+            "income": round(float(baseline.income.sum()), 2),
+            "expense": np.round(baseline.expense, 2).tolist(),
+            "net": round(float(baseline.income.sum() - baseline.expense.sum()), 2),
+        },
+        "scenarios": [
+            {
+                "name": scenario.get("name", str(i)),
+                "months": int(result["months"][i]),
+                "income": income[i],
+                "expense": expense[i],
+                "projected_net": projected_net[i],
+                "delta": delta[i],
+            }
+            for i, scenario in enumerate(scenarios)
+        ],
+    }
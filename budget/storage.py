@@ -0,0 +1,677 @@
+# budget/storage.py
+
+"""
+Storage for the per-user JSON ledgers used by budget/views.py.
+
+Views only ever call load_user_data() / save_user_data(). Ledger files
+live under settings.BUDGET_DATA_ROOT, spread over hash-sharded
+subdirectories (settings.BUDGET_DATA_SHARD_DEPTH levels); get_user_file()
+is the only place that knows that layout. A backend (picked with
+settings.BUDGET_LEDGER_BACKEND) decides what goes into the files:
+
+  - JsonFileBackend: one <username>_data.json, rewritten on every save.
+  - JournalBackend:  the same file acts as a snapshot, and each save
+    only appends the changes to <username>_data.journal. The journal is
+    folded back into the snapshot in the background once it grows past
+    settings.BUDGET_JOURNAL_COMPACT_BYTES.
+
+Parsed ledgers are kept in a small per-process LRU cache that is
+validated against the on-disk file stamps on every load.
+
+Writes are safe across threads and worker processes: every ledger has
+an advisory lock file next to it, files are replaced atomically
+(temp file + fsync + rename), and update_user_data() group-commits
+concurrent updates for the same user into a single fsync'd write.
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Event, Lock, get_ident
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+LEDGER_SUFFIX = "_data.json"
+JOURNAL_SUFFIX = "_data.journal"
+
+
+def data_root():
+    """Directory all ledgers live under (settings.BUDGET_DATA_ROOT)."""
+    return os.fspath(getattr(settings, "BUDGET_DATA_ROOT", "."))
+
+
+def _shard_depth():
+    return getattr(settings, "BUDGET_DATA_SHARD_DEPTH", 0)
+
+
+def user_dir(username):
+    """
+    Shard directory for a user: one level per two hex digits of the
+    SHA-1 of the username, e.g. <root>/3f/a9/ for a depth of 2. That
+    spreads users evenly and keeps every directory small.
+    """
+    depth = _shard_depth()
+    if not depth:
+        return data_root()
+    digest = hashlib.sha1(username.encode("utf-8")).hexdigest()
+    return os.path.join(data_root(), *(digest[2 * i:2 * i + 2] for i in range(depth)))
+
+
+def get_user_file(username, suffix=LEDGER_SUFFIX):
+    if not username or os.path.basename(username) != username or username in (".", ".."):
+        raise ValueError(f"Invalid username for a ledger file: {username!r}")
+    return os.path.join(user_dir(username), f"{username}{suffix}")
+
+
+def iter_usernames():
+    """Yield the username of every stored ledger, without listing them all at once."""
+    def walk(path, depth):
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if depth:
+                    if entry.is_dir():
+                        yield from walk(entry.path, depth - 1)
+                elif entry.name.endswith(LEDGER_SUFFIX) and entry.is_file():
+                    yield entry.name[: -len(LEDGER_SUFFIX)]
+
+    yield from walk(data_root(), _shard_depth())
+
+
+def read_user_data(username):
+    """
+    The stored ledger exactly as the backend returns it, or None.
+
+    Unlike load_user_data() this neither copies nor caches, which is
+    what bulk jobs walking every ledger want.
+    """
+    with ledger_lock(username, shared=True):
+        return get_backend().read(username)
+
+
+def _empty_ledger():
+    return {
+        "income": {},
+        "next_income_id": 1,
+        "expenses": [],
+        "total_income": 0,
+        "total_expense": 0,
+        "balance": 0,
+    }
+
+
+def _index_by_id(entries):
+    """
+    {str(id): entry} for a list of income entries.
+
+    Older ledgers handed out ids as len(income) + 1, so after a delete
+    two entries can share an id; later duplicates, and entries without
+    an integer id, get a fresh one.
+    """
+    next_id = max((e["id"] for e in entries if isinstance(e.get("id"), int)), default=0) + 1
+    indexed = {}
+    for entry in entries:
+        key = str(entry.get("id"))
+        if not isinstance(entry.get("id"), int) or key in indexed:
+            entry["id"] = next_id
+            key = str(next_id)
+            next_id += 1
+        indexed[key] = entry
+    return indexed
+
+
+def _by_id(income):
+    """`income` with its keys in ascending id order (what the page cursors rely on)."""
+    keys = [int(k) for k in income]
+    if keys == sorted(keys):
+        return income
+    return {str(k): income[str(k)] for k in sorted(keys)}
+
+
+def _upgrade_ledger(data):
+    """
+    Bring an older ledger up to the current shape, in place: incomes
+    keyed by id, in id order, plus a monotonic "next_income_id" counter.
+    """
+    if data is None:
+        return None
+    income = data.get("income", {})
+    if isinstance(income, list):
+        income = _index_by_id(income)
+    # Renumbered duplicates (and ledgers upgraded before this was done)
+    # can leave ids out of order
+    income = data["income"] = _by_id(income)
+    if "next_income_id" not in data:
+        data["next_income_id"] = max((int(k) for k in income), default=0) + 1
+    return data
+
+
+def _copy_ledger(data):
+    """
+    Cheap copy of a ledger so views can mutate what they get back
+    without touching the cached version.
+    """
+    copied = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            copied[key] = [dict(item) if isinstance(item, dict) else item for item in value]
+        elif isinstance(value, dict):
+            copied[key] = {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+        else:
+            copied[key] = value
+    return copied
+
+
+def _file_stamp(filename):
+    """(inode, mtime_ns, size) of a ledger file, or None if it does not exist."""
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+@contextmanager
+def ledger_lock(username, shared=False):
+    """
+    Advisory lock on <username>_data.json.lock.
+
+    Writers take it exclusively. Readers take it shared so they never
+    see a snapshot and a journal from two different generations.
+    """
+    path = get_user_file(username) + ".lock"
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    except FileNotFoundError:
+        # First time we see this user: create their shard directory
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            # msvcrt has no shared mode; it also only retries for ~10s
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        yield
+    finally:
+        # Closing the descriptor releases the lock on both platforms
+        os.close(fd)
+
+
+def _fsync_write(f, text):
+    f.write(text)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _atomic_write_json(filename, data):
+    """Write `data` to a temp file, fsync it, and rename it over `filename`."""
+    tmp = f"{filename}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            _fsync_write(f, json.dumps(data))
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# -------------------------------------------
+# LEDGER CACHE
+# -------------------------------------------
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LedgerCache:
+    """
+    Bounded LRU cache of parsed ledgers keyed by username.
+
+    Every entry remembers the stamp of the file(s) it came from, so a
+    write made by another worker process shows up as a changed stamp
+    and the entry is simply re-read.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, username, stamp, count_miss=True):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] != stamp:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, username):
+        """Last known ledger for a user, whatever its stamp (no counters)."""
+        with self._lock:
+            entry = self._entries.get(username)
+            return entry[1] if entry else None
+
+    def put(self, username, stamp, data):
+        with self._lock:
+            self._entries[username] = (stamp, data)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+
+_ledger_cache = LedgerCache(getattr(settings, "BUDGET_LEDGER_CACHE_SIZE", 256))
+
+
+def ledger_cache_info():
+    """Hit/miss counters for the ledger cache (like functools.lru_cache)."""
+    return _ledger_cache.info()
+
+
+def ledger_cache_clear():
+    _ledger_cache.clear()
+
+
+# -------------------------------------------
+# BACKENDS
+# -------------------------------------------
+class JsonFileBackend:
+    """
+    The original format: the whole ledger is one JSON document that is
+    rewritten on every save.
+    """
+
+    def stamp(self, username):
+        return _file_stamp(get_user_file(username))
+
+    def _read_snapshot(self, username):
+        try:
+            with open(get_user_file(username), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read(self, username):
+        """Return the stored ledger, or None if the user has no file yet."""
+        return _upgrade_ledger(self._read_snapshot(username))
+
+    def write(self, username, old, new):
+        """Persist `new`. Callers hold ledger_lock(username)."""
+        _atomic_write_json(get_user_file(username), new)
+
+
+SEQ_KEY = "_journal_seq"
+_MISSING = object()
+
+
+def _diff_ledger(old, new):
+    """
+    Turn the change from `old` to `new` into a list of small journal ops.
+
+    Lists that only grew become "extend" ops, dicts become per-key
+    "update" ops, anything else is "set" wholesale.
+    """
+    ops = []
+    for key, value in new.items():
+        if key == SEQ_KEY:
+            continue
+        before = old.get(key, _MISSING)
+        if before == value:
+            continue
+        if (
+            isinstance(before, list)
+            and isinstance(value, list)
+            and len(value) >= len(before)
+            and value[: len(before)] == before
+        ):
+            ops.append({"op": "extend", "key": key, "items": value[len(before):]})
+        elif isinstance(before, dict) and isinstance(value, dict):
+            changed = {k: v for k, v in value.items() if before.get(k, _MISSING) != v}
+            removed = [k for k in before if k not in value]
+            ops.append({"op": "update", "key": key, "set": changed, "del": removed})
+        else:
+            ops.append({"op": "set", "key": key, "value": value})
+    for key in old:
+        if key != SEQ_KEY and key not in new:
+            ops.append({"op": "del", "key": key})
+    return ops
+
+
+def _apply_ops(data, ops):
+    for op in ops:
+        kind, key = op["op"], op["key"]
+        if kind == "extend":
+            data.setdefault(key, []).extend(op["items"])
+        elif kind == "update":
+            target = data.setdefault(key, {})
+            if isinstance(target, list):
+                # Written before incomes were keyed by id
+                target = data[key] = _index_by_id(target)
+            target.update(op["set"])
+            for k in op["del"]:
+                target.pop(k, None)
+        elif kind == "set":
+            data[key] = op["value"]
+        elif kind == "del":
+            data.pop(key, None)
+
+
+class JournalBackend(JsonFileBackend):
+    """
+    Append-only journal on top of a JSON snapshot.
+
+    <username>_data.json is the snapshot (so existing files load as-is)
+    and <username>_data.journal holds one JSON record per save:
+
+        {"seq": 12, "ops": [{"op": "extend", "key": "income", "items": [...]}, ...]}
+
+    The snapshot records the last sequence number folded into it, so
+    replay skips anything already compacted even if a crash happened
+    between writing the snapshot and trimming the journal.
+    """
+
+    def __init__(self):
+        self._pending_guard = Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal-compact")
+
+    def journal_file(self, username):
+        return get_user_file(username, JOURNAL_SUFFIX)
+
+    def stamp(self, username):
+        snap = _file_stamp(get_user_file(username))
+        journal = _file_stamp(self.journal_file(username))
+        if snap is None and journal is None:
+            return None
+        return (snap, journal)
+
+    def read(self, username):
+        data = self._read_snapshot(username)
+        journal = self.journal_file(username)
+        if not os.path.exists(journal):
+            return _upgrade_ledger(data)
+        if data is None:
+            data = _empty_ledger()
+        seq = data.get(SEQ_KEY, 0)
+        with open(journal, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from an interrupted append
+                    break
+                if record["seq"] <= seq:
+                    continue
+                _apply_ops(data, record["ops"])
+                seq = record["seq"]
+        data[SEQ_KEY] = seq
+        return _upgrade_ledger(data)
+
+    def write(self, username, old, new):
+        ops = _diff_ledger(old, new)
+        seq = old.get(SEQ_KEY, 0)
+        if ops:
+            seq += 1
+        new[SEQ_KEY] = seq
+        if not ops:
+            return
+        line = json.dumps({"seq": seq, "ops": ops}, separators=(",", ":"))
+        journal = self.journal_file(username)
+        with open(journal, "a") as f:
+            _fsync_write(f, line + "\n")
+        size = os.path.getsize(journal)
+        if size > getattr(settings, "BUDGET_JOURNAL_COMPACT_BYTES", 256 * 1024):
+            self.schedule_compaction(username)
+
+    def schedule_compaction(self, username):
+        """Fold the journal into the snapshot on the background thread."""
+        with self._pending_guard:
+            if username in self._pending:
+                return None
+            self._pending.add(username)
+        return self._executor.submit(self._compact_pending, username)
+
+    def _compact_pending(self, username):
+        try:
+            self.compact(username)
+        finally:
+            with self._pending_guard:
+                self._pending.discard(username)
+
+    def compact(self, username):
+        snapshot = get_user_file(username)
+        journal = self.journal_file(username)
+        with ledger_lock(username):
+            data = self.read(username)
+            if data is None:
+                return
+            _atomic_write_json(snapshot, data)
+            # Everything up to data[SEQ_KEY] now lives in the snapshot
+            if os.path.exists(journal):
+                os.remove(journal)
+
+
+_backends = {}
+
+
+def get_backend():
+    path = getattr(settings, "BUDGET_LEDGER_BACKEND", "budget.storage.JsonFileBackend")
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends[path] = import_string(path)()
+    return backend
+
+
+# -------------------------------------------
+# PUBLIC API
+# -------------------------------------------
+def _current(backend, username):
+    """
+    The stored ledger (cached copy if still valid) without copying it.
+    Callers hold ledger_lock(username) in either mode.
+    """
+    stamp = backend.stamp(username)
+    if stamp is None:
+        _ledger_cache.discard(username)
+        return None
+    cached = _ledger_cache.get(username, stamp)
+    if cached is not None:
+        return cached
+    data = backend.read(username)
+    if data is not None:
+        _ledger_cache.put(username, stamp, data)
+    return data
+
+
+def load_user_data(username):
+    backend = get_backend()
+    # Fast path: the file has not changed since we last parsed it
+    stamp = backend.stamp(username)
+    if stamp is not None:
+        # (a miss here is counted by _current below)
+        cached = _ledger_cache.get(username, stamp, count_miss=False)
+        if cached is not None:
+            return _copy_ledger(cached)
+
+    with ledger_lock(username, shared=True):
+        data = _current(backend, username)
+    if data is None:
+        return _empty_ledger()
+    return _copy_ledger(data)
+
+
+def save_user_data(username, data):
+    """
+    Overwrite a user's ledger with `data`.
+
+    Prefer update_user_data() for read-modify-write: a load followed by a
+    save can still lose an update made by another request in between.
+    """
+    backend = get_backend()
+    _upgrade_ledger(data)
+    with ledger_lock(username):
+        old = _current(backend, username) or {}
+        backend.write(username, old, data)
+        # Keep our own copy so the caller can go on mutating theirs
+        _ledger_cache.put(username, backend.stamp(username), _copy_ledger(data))
+
+
+# -------------------------------------------
+# GROUP COMMIT
+# -------------------------------------------
+class _PendingUpdate:
+    def __init__(self, mutate):
+        self.mutate = mutate
+        self.result = None
+        self.error = None
+        self.done = Event()
+
+
+class GroupCommitter:
+    """
+    Merges concurrent update_user_data() calls for the same user.
+
+    The first caller for a user becomes the leader: it waits
+    settings.BUDGET_GROUP_COMMIT_WINDOW seconds, takes the ledger lock,
+    and then applies every update queued so far (including ones that
+    arrived while it was waiting for the lock) to one copy of the ledger,
+    which is written and fsync'd once. Followers just wait for the leader
+    to hand back their result.
+    """
+
+    def __init__(self):
+        self.commits = 0
+        self.updates = 0
+        self._queues = {}
+        self._guard = Lock()
+
+    def submit(self, username, mutate):
+        pending = _PendingUpdate(mutate)
+        with self._guard:
+            queue = self._queues.get(username)
+            leader = queue is None
+            if leader:
+                queue = self._queues[username] = []
+            queue.append(pending)
+
+        if leader:
+            window = getattr(settings, "BUDGET_GROUP_COMMIT_WINDOW", 0.002)
+            if window:
+                time.sleep(window)
+            self._commit(username)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _commit(self, username):
+        backend = get_backend()
+        batch = []
+        try:
+            with ledger_lock(username):
+                with self._guard:
+                    batch = self._queues.pop(username)
+
+                base = _current(backend, username) or _empty_ledger()
+                data = base
+                for pending in batch:
+                    # Each update gets its own copy so one that fails
+                    # halfway cannot leave the others a broken ledger.
+                    attempt = _copy_ledger(data)
+                    try:
+                        pending.result = pending.mutate(attempt)
+                    except Exception as exc:
+                        pending.error = exc
+                    else:
+                        data = attempt
+
+                if data is not base:
+                    backend.write(username, base, data)
+                    _ledger_cache.put(username, backend.stamp(username), data)
+                    with self._guard:
+                        self.commits += 1
+                        self.updates += len(batch)
+        except BaseException as exc:
+            with self._guard:
+                # Nobody has taken the queue yet if we failed before popping it
+                if not batch:
+                    batch = self._queues.pop(username, [])
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = exc
+            raise
+        finally:
+            for pending in batch:
+                pending.done.set()
+
+
+_committer = GroupCommitter()
+
+
+def _reset_after_fork():
+    # A fork can happen while another thread holds one of our locks
+    # (e.g. gunicorn --preload); the child starts over with fresh state.
+    global _committer
+    _committer = GroupCommitter()
+    _backends.clear()
+    _ledger_cache._lock = Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def update_user_data(username, mutate):
+    """
+    Atomically apply `mutate(ledger)` to a user's ledger.
+
+    `mutate` edits the dict it is given in place; its return value is
+    handed back to the caller. Concurrent calls for the same user (from
+    any thread) are committed together in one write, and the ledger lock
+    keeps other worker processes out while that happens.
+    """
+    return _committer.submit(username, mutate)
+
+
+def group_commit_info():
+    """(commits, updates) counters: updates / commits is the batching factor."""
+    return _committer.commits, _committer.updates
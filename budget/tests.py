@@ -13,16 +13,46 @@ Sections:
 from decimal import Decimal
 from datetime import date
 
+from django.db import connection
+from django.db.models import Sum
 from django.urls import reverse
-import os, json
+import os, json, time
 
 from .models import Expense, Budget, Category, Transaction
 
 
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings, tag
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 
 
+# The tests clear and fill the cache: give them their own directory
+# rather than the checkout's (or the server's) BUDGET_CACHE_DIR
+_cache_override = None
+
+
+def setUpModule():
+    global _cache_override
+    import tempfile
+    from django.conf import settings
+
+    _cache_override = override_settings(CACHES={
+        "default": {**settings.CACHES["default"], "LOCATION": tempfile.mkdtemp(prefix="budget-test-cache-")},
+    })
+    _cache_override.enable()
+
+
+def tearDownModule():
+    import shutil
+    from django.conf import settings
+
+    location = settings.CACHES["default"]["LOCATION"]
+    _cache_override.disable()
+    shutil.rmtree(location, ignore_errors=True)
+
+
 
 
 class Epic3ExpenseManagementTest(TestCase):
@@ -52,7 +82,6 @@ class Epic3ExpenseManagementTest(TestCase):
         Expense.objects.create(category='Food', amount=100)
         all_expenses = Expense.objects.all()
         self.assertEqual(all_expenses.count(), 2)
-=======
 
 
 # ============================================================
@@ -82,6 +111,104 @@ class ExpenseModelTests(TestCase):
         self.assertFalse(exp.recurring)
 
 
+class MoneyCentsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cents", password="pass123")
+
+    def test_amount_is_decimal_stored_as_integer_cents(self):
+        exp = Expense.objects.create(user=self.user, amount="12.5", category="Food")
+        self.assertEqual(exp.amount, Decimal("12.50"))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount FROM budget_expense WHERE id = %s", [exp.id])
+            self.assertEqual(cursor.fetchone()[0], 1250)
+        self.assertEqual(Expense.objects.get(id=exp.id).amount, Decimal("12.50"))
+
+    def test_assignment_normalises(self):
+        exp = Expense(amount=0.1)
+        self.assertEqual(exp.amount, Decimal("0.10"))
+        exp.amount = 2
+        self.assertEqual(exp.amount, Decimal("2.00"))
+
+    def test_sum_is_exact(self):
+        # 0.1 + 0.2 + ... in floats drifts; in cents it can't
+        Expense.objects.bulk_create(
+            [Expense(user=self.user, amount=0.1, category="Food") for _ in range(1000)]
+        )
+        self.assertNotEqual(sum(0.1 for _ in range(1000)), 100)
+        total = Expense.objects.aggregate(total=Sum("amount"))["total"]
+        self.assertEqual(total, Decimal("100.00"))
+        self.assertEqual(Expense.objects.filter(amount__gte=Decimal("0.1")).count(), 1000)
+
+    def test_api_round_trips_amounts(self):
+        self.client.login(username="cents", password="pass123")
+        resp = self.client.post(reverse("create_expense"), {"amount": "0.1", "category": "Food"})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["amount"], 0.1)
+        self.assertEqual(Expense.objects.get().amount, Decimal("0.10"))
+        for bad in ("NaN", "Infinity", "1e400", "0.001", "100000000"):
+            resp = self.client.post(reverse("create_expense"), {"amount": bad, "category": "Food"})
+            self.assertEqual(resp.status_code, 400, bad)
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_sum_two_million_rows(self):
+        """Float column summed exactly in Python (before) vs SUM of integer cents (after)."""
+        rows = 2_000_000
+        amounts = [(n % 9999 + 1) / 100 for n in range(rows)]  # 0.01 .. 99.99
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TEMP TABLE float_expense (amount REAL NOT NULL)")
+            cursor.executemany("INSERT INTO float_expense VALUES (%s)", [(a,) for a in amounts])
+            cursor.executemany(
+                "INSERT INTO budget_expense (user_id, amount, category, note, date, recurring, date_added) "
+                "VALUES (%s, %s, 'Food', '', '2025-10-01', 0, '2025-10-01 00:00:00')",
+                [(self.user.id, round(a * 100)) for a in amounts],
+            )
+            expected = sum(Decimal(str(a)) for a in amounts)
+
+            started = time.perf_counter()
+            cursor.execute("SELECT amount FROM float_expense")
+            before = sum(Decimal(str(a)) for (a,) in cursor.fetchall())
+            before_elapsed = time.perf_counter() - started
+
+            cursor.execute("SELECT SUM(amount) FROM float_expense")
+            float_sum = cursor.fetchone()[0]
+
+        started = time.perf_counter()
+        after = Expense.objects.aggregate(total=Sum("amount"))["total"]
+        after_elapsed = time.perf_counter() - started
+
+        print(f"\nSUM over {rows:,} rows: float + Decimal(str()) {before_elapsed * 1000:.0f} ms, "
+              f"integer cents {after_elapsed * 1000:.0f} ms; "
+              f"float SUM drift {abs(Decimal(float_sum) - expected):.2E}")
+        self.assertEqual(before, expected)
+        self.assertEqual(after, expected)
+        self.assertLess(after_elapsed, before_elapsed)
+
+
+class CentsMigrationTests(TransactionTestCase):
+    def test_float_amounts_become_cents_and_back(self):
+        from django.db.migrations.executor import MigrationExecutor
+
+        before, after = [("budget", "0008_budgetmonthcategoryrollup")], [("budget", "0009_income_expense_amount_cents")]
+        executor = MigrationExecutor(connection)
+        executor.migrate(before)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO budget_income (source, amount, date_added) VALUES ('Job', 1234.56, '2025-10-01')"
+            )
+        MigrationExecutor(connection).migrate(after)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount FROM budget_income")
+            self.assertEqual(cursor.fetchone()[0], 123456)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(before)  # and back
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount FROM budget_income")
+            self.assertAlmostEqual(cursor.fetchone()[0], 1234.56)
+        MigrationExecutor(connection).migrate(executor.loader.graph.leaf_nodes())
+
+
 class ExpenseAPITests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -106,6 +233,70 @@ class ExpenseAPITests(TestCase):
         self.assertEqual(response.status_code, 400)
 
 
+class BulkExpenseAPITests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="bulkuser", password="pass123")
+        self.client.login(username="bulkuser", password="pass123")
+        self.url = reverse("create_expenses_bulk")
+
+    def test_json_array_creates_valid_items_and_reports_the_rest(self):
+        items = [
+            {"amount": 12.5, "category": "Food", "note": "Lunch", "date": "2025-10-03"},
+            {"amount": -3, "category": "Food"},
+            {"amount": 7, "category": ""},
+            "not an object",
+            {"amount": 4, "category": "Bus", "date": "2025-02-30"},
+            {"amount": 9, "category": "Bus"},
+        ]
+        resp = self.client.post(self.url, items, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data["created"], data["failed"]), (2, 4))
+        results = data["results"]
+        self.assertEqual([r["index"] for r in results], list(range(6)))
+        self.assertEqual(
+            [("id" in r, r.get("error")) for r in results],
+            [(True, None), (False, "Invalid expense data"), (False, "Invalid expense data"),
+             (False, "Invalid expense data"), (False, "Invalid date"), (True, None)],
+        )
+        lunch = Expense.objects.get(pk=results[0]["id"])
+        self.assertEqual((lunch.user, lunch.date, lunch.note), (self.user, date(2025, 10, 3), "Lunch"))
+
+    def test_ndjson_stream(self):
+        body = "\n".join(json.dumps({"amount": n + 1, "category": "Food"}) for n in range(3)) + "\n{oops\n"
+        resp = self.client.post(self.url, body, content_type="application/x-ndjson")
+        data = resp.json()
+        self.assertEqual((data["created"], data["failed"]), (3, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+
+    def test_bulk_invalidates_the_expense_list_etag(self):
+        list_url = reverse("list_expenses")
+        etag = self.client.get(list_url, {"month": "2025-10"})["ETag"]
+        self.client.post(self.url, [{"amount": 1, "category": "Food", "date": "2025-10-01"}],
+                         content_type="application/json")
+        resp = self.client.get(list_url, {"month": "2025-10"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 1)
+
+    def test_bad_payloads(self):
+        self.assertEqual(self.client.post(self.url, "{", content_type="application/json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, {"a": 1}, content_type="application/json").status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.post(self.url, [], content_type="application/json").status_code, 403)
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_ten_thousand_items(self):
+        items = [{"amount": n % 90 + 1, "category": "Food", "note": f"n{n}", "date": "2025-10-01"}
+                 for n in range(10_000)]
+        started = time.perf_counter()
+        resp = self.client.post(self.url, items, content_type="application/json")
+        elapsed = time.perf_counter() - started
+        print(f"\n10k-item bulk expense request: {elapsed * 1000:.0f} ms")
+        self.assertEqual(resp.json()["created"], 10_000)
+        self.assertLess(elapsed, 1.0)
+
+
 class ExpenseListTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
@@ -142,6 +333,173 @@ class ExpenseListTests(TestCase):
         response = self.client.get(self.list_url, {"month": "2025-10"})
         self.assertEqual(response.status_code, 403)
 
+    def _walk(self, params):
+        """Follow X-Next-Cursor through every page; returns (pages, rows)."""
+        pages, rows, params = 0, [], dict(params)
+        while True:
+            resp = self.client.get(self.list_url, params)
+            self.assertEqual(resp.status_code, 200)
+            body = b"".join(resp.streaming_content) if resp.streaming else resp.content
+            rows += json.loads(body)
+            pages += 1
+            if "X-Next-Cursor" not in resp:
+                return pages, rows
+            self.assertIn(f"cursor={resp['X-Next-Cursor']}", resp["Link"])
+            params["cursor"] = resp["X-Next-Cursor"]
+
+    def test_keyset_pages_cover_every_row_once(self):
+        Expense.objects.bulk_create([
+            Expense(user=self.user, amount=n + 1, category="Food" if n % 3 else "Bus",
+                    date=date(2025, 10, n % 7 + 1))
+            for n in range(50)
+        ])
+        expected = list(Expense.objects.filter(user=self.user).order_by("date", "id").values_list("id", flat=True))
+        for limit in (7, 50, 1000):
+            pages, rows = self._walk({"month": "2025-10", "limit": limit})
+            self.assertEqual([r["id"] for r in rows], expected)
+            self.assertEqual(pages, -(-50 // limit))
+
+        # the streamed path, for pages over STREAM_ABOVE rows
+        from budget import views_api
+        views_api.STREAM_ABOVE, saved = 5, views_api.STREAM_ABOVE
+        try:
+            _, rows = self._walk({"start": "2025-10-02", "end": "2025-10-03", "category": "Food", "limit": 6})
+        finally:
+            views_api.STREAM_ABOVE = saved
+        self.assertEqual(
+            [r["id"] for r in rows],
+            list(Expense.objects.filter(user=self.user, category="Food", date__range=(date(2025, 10, 2), date(2025, 10, 3)))
+                 .order_by("date", "id").values_list("id", flat=True)),
+        )
+
+    def test_bad_cursor_and_filters(self):
+        for params in ({"month": "2025-10", "cursor": "nope"}, {"start": "2025-13-01"}, {"month": "2025-10", "limit": 0}):
+            self.assertEqual(self.client.get(self.list_url, params).status_code, 400)
+
+    def test_unchanged_list_gets_304(self):
+        Expense.objects.create(user=self.user, amount=50, category="Food", date=date(2025, 10, 1))
+        first = self.client.get(self.list_url, {"month": "2025-10"})
+        etag = first["ETag"]
+
+        # session + user lookups only: the expense query never runs
+        with self.assertNumQueries(2):
+            resp = self.client.get(self.list_url, {"month": "2025-10"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        other_month = self.client.get(self.list_url, {"month": "2025-09"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other_month.status_code, 200)
+
+        Expense.objects.create(user=self.user, amount=5, category="Food", date=date(2025, 10, 2))
+        resp = self.client.get(self.list_url, {"month": "2025-10"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()), 2)
+
+
+class ExpenseSummaryTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username="summary", password="pass123")
+        other = User.objects.create_user(username="other", password="pass123")
+        self.client.login(username="summary", password="pass123")
+        self.url = reverse("expense_summary")
+        Expense.objects.bulk_create([
+            Expense(user=self.user, amount="10.10", category="Food", date=date(2025, 10, 1)),
+            Expense(user=self.user, amount="0.20", category="Food", date=date(2025, 10, 8)),
+            Expense(user=self.user, amount="99.99", category="Rent", date=date(2025, 10, 9)),
+            Expense(user=self.user, amount="5.00", category="Bus", date=date(2025, 11, 1)),
+            Expense(user=other, amount="1000.00", category="Food", date=date(2025, 10, 1)),
+        ])
+
+    def test_by_category(self):
+        data = self.client.get(self.url, {"month": "2025-10"}).json()
+        self.assertEqual((data["start"], data["end"], data["group_by"]), ("2025-10-01", "2025-10-31", "category"))
+        self.assertEqual(data["groups"], [
+            {"key": "Rent", "total": 99.99, "count": 1},
+            {"key": "Food", "total": 10.3, "count": 2},
+        ])
+        self.assertEqual((data["total"], data["count"]), (110.29, 3))
+
+    def test_by_week_includes_empty_periods(self):
+        data = self.client.get(self.url, {"start": "2025-10-01", "end": "2025-10-20", "group_by": "week"}).json()
+        self.assertEqual(
+            [(g["key"], g["total"], g["count"]) for g in data["groups"]],
+            [("2025-09-29", 10.1, 1), ("2025-10-06", 100.19, 2), ("2025-10-13", 0.0, 0), ("2025-10-20", 0.0, 0)],
+        )
+        data = self.client.get(self.url, {"start": "2025-10-01", "end": "2025-11-30", "group_by": "month",
+                                          "category": ["Bus", "Rent"]}).json()
+        self.assertEqual([(g["key"], g["total"]) for g in data["groups"]], [("2025-10-01", 99.99), ("2025-11-01", 5.0)])
+
+    def test_cached_until_expenses_change(self):
+        params = {"month": "2025-10", "group_by": "day"}
+        self.assertEqual(len(self.client.get(self.url, params).json()["groups"]), 31)
+        # session + user lookups only: served from the cache
+        with self.assertNumQueries(2):
+            etag = self.client.get(self.url, params)["ETag"]
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Expense.objects.create(user=self.user, amount="1.00", category="Food", date=date(2025, 10, 31))
+        resp = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["groups"][-1], {"key": "2025-10-31", "total": 1.0, "count": 1})
+
+    def test_bad_requests(self):
+        for params in ({}, {"start": "2025-10-01"}, {"start": "2025-10-02", "end": "2025-10-01"},
+                       {"month": "2025-10", "group_by": "year"}, {"month": "2025-13"},
+                       {"start": "2020-01-01", "end": "2025-12-31", "group_by": "day"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url, {"month": "2025-10"}).status_code, 403)
+
+    def test_ranges_at_the_end_of_the_calendar(self):
+        for params in ({"month": "9999-12"}, {"month": "99999999999999999999-01"},
+                       {"start": "9999-01-01", "end": "9999-12-31", "group_by": "week"},
+                       {"start": "9999-12-01", "end": "9999-12-31", "group_by": "month"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+        # the last week starts on 9999-12-27; the one after can't
+        data = self.client.get(self.url, {"start": "9999-12-01", "end": "9999-12-30", "group_by": "week"}).json()
+        self.assertEqual(data["groups"][-1]["key"], "9999-12-27")
+        data = self.client.get(self.url, {"start": "9999-11-01", "end": "9999-12-30", "group_by": "month"}).json()
+        self.assertEqual([g["key"] for g in data["groups"]], ["9999-11-01", "9999-12-01"])
+
+    def test_zero_fill_stops_before_date_max(self):
+        from budget.reporting import expense_summary
+
+        groups = expense_summary(self.user.pk, date(9999, 12, 1), date.max, "day")["groups"]
+        self.assertEqual(len(groups), 31)
+        self.assertEqual(groups[-1]["key"], date.max)
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_summary_vs_full_list(self):
+        from datetime import timedelta
+
+        categories = [f"Category {n}" for n in range(20)]
+        Expense.objects.bulk_create(
+            [Expense(user=self.user, amount=n % 5000 / 100 + 1, category=categories[n % 20],
+                     date=date(2024, 1, 1) + timedelta(days=n % 366)) for n in range(200_000)],
+            batch_size=5000,
+        )
+        params = {"start": "2024-01-01", "end": "2024-12-31"}
+
+        self.list_url = reverse("list_expenses")
+        started = time.perf_counter()
+        _, rows = ExpenseListTests._walk(self, {**params, "limit": 1000})
+        list_elapsed = time.perf_counter() - started
+        list_bytes = len(json.dumps(rows))
+
+        sizes = {}
+        started = time.perf_counter()
+        for group_by in ("category", "day", "week", "month"):
+            sizes[group_by] = len(self.client.get(self.url, {**params, "group_by": group_by}).content)
+        summary_elapsed = (time.perf_counter() - started) / 4
+
+        print(f"\n200k expenses: full list {list_elapsed * 1000:.0f} ms / {list_bytes / 1e6:.1f} MB; "
+              f"summary {summary_elapsed * 1000:.0f} ms avg, "
+              + ", ".join(f"{g} {n / 1e3:.1f} kB" for g, n in sizes.items()))
+        self.assertEqual(len(rows), 200_000)
+        self.assertLess(max(sizes.values()), 50_000)
+
 
 # ============================================================
 # 2) Epic 5 – Budget summaries & reports (stories 23–28)
@@ -229,6 +587,491 @@ class MonthlySummaryTests(Epic5Base):
         self.assertEqual(summary["Rent"], Decimal("900.00"))
 
 
+class KpiSeriesTests(Epic5Base):
+    def test_monthly_kpis_is_a_single_query(self):
+        from budget.reporting import monthly_kpis
+
+        with self.assertNumQueries(1):
+            monthly_kpis(self.budget.id, year=2026, month=2)
+
+    def test_series_fills_every_month_from_one_query(self):
+        from budget.reporting import kpi_series
+
+        Transaction.objects.create(budget=self.budget, category=self.food, date=date(2026, 4, 2),
+                                   description="Groceries", amount=Decimal("-40.00"))
+
+        with self.assertNumQueries(1):
+            series = kpi_series(self.budget.id, date(2026, 1, 1), date(2026, 4, 30))
+
+        self.assertEqual([p["period"] for p in series],
+                         [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1), date(2026, 4, 1)])
+        self.assertEqual(series[0]["net"], Decimal("0"))
+        self.assertEqual(series[1]["income"], Decimal("2000.00"))
+        self.assertEqual(series[1]["net"], Decimal("850.00"))
+        self.assertEqual(series[3]["expense"], Decimal("-40.00"))
+
+    def test_weekly_and_daily_series(self):
+        from budget.reporting import kpi_series
+
+        weeks = kpi_series(self.budget.id, date(2026, 2, 1), date(2026, 2, 15), "week")
+        # 2026-02-01 is a Sunday, so the first week starts on 2026-01-26
+        self.assertEqual(weeks[0]["period"], date(2026, 1, 26))
+        self.assertEqual(sum(w["net"] for w in weeks), Decimal("850.00"))
+
+        days = kpi_series(self.budget.id, date(2026, 2, 5), date(2026, 2, 10), "day")
+        self.assertEqual(len(days), 6)
+        self.assertEqual(days[0]["income"], Decimal("2000.00"))
+        self.assertEqual(days[5]["expense"], Decimal("-900.00"))
+
+        with self.assertRaises(ValueError):
+            kpi_series(self.budget.id, date(2026, 2, 1), date(2026, 2, 2), "year")
+
+
+class DateIndexQueryPlanTests(Epic5Base):
+    """
+    EXPLAIN QUERY PLAN evidence for the month filters.
+
+    Before: date__year/date__month. Django turns the year into a range,
+    but the month becomes django_date_extract('month', date) evaluated
+    for every row of the year. After: a half-open range that SQLite
+    answers straight from the composite index.
+    """
+
+    def _program(self, qs):
+        """The SQLite bytecode (EXPLAIN) for qs, as (opcode, p4) pairs."""
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN " + sql, params)
+            return [(row[1], row[5]) for row in cursor.fetchall()]
+
+    def test_month_filter_is_an_index_range(self):
+        from budget.reporting import month_range
+
+        before = Transaction.objects.filter(budget_id=self.budget.id, date__year=2026, date__month=2)
+        self.assertIn("django_date_extract", str(before.query))
+        # The index only narrows it down to the year...
+        self.assertIn("USING INDEX txn_budget_date_idx (budget_id=? AND date>? AND date<?)", before.explain())
+        # ...and the month is checked by a function call per row inside
+        # the index loop
+        program = self._program(before)
+        ops = [op for op, _ in program]
+        extract = program.index(("Function", "django_date_extract(2)"))
+        self.assertLess(ops.index("SeekGE"), extract)
+        self.assertLess(extract, ops.index("Next"))
+
+        start, stop = month_range(2026, 2)
+        after = Transaction.objects.filter(budget_id=self.budget.id, date__gte=start, date__lt=stop)
+        self.assertNotIn("django_date_extract", str(after.query))
+        plan = after.explain()
+        self.assertIn("USING INDEX txn_budget_date_idx (budget_id=? AND date>? AND date<?)", plan)
+        self.assertNotIn("Function", [op for op, _ in self._program(after)])
+
+    def test_last_month_has_no_range(self):
+        from budget.reporting import month_range
+
+        self.assertEqual(month_range(9999, 11)[1], date(9999, 12, 1))
+        with self.assertRaises(ValueError):
+            month_range(9999, 12)
+        self.client.login(username="derrick", password="pass123")
+        response = self.client.get(reverse("list_expenses"), {"month": "9999-12"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_and_expense_indexes_are_used(self):
+        from budget.reporting import month_range
+
+        start, stop = month_range(2026, 2)
+        plan = Transaction.objects.filter(
+            budget_id=self.budget.id, category_id=self.food.id, date__gte=start, date__lt=stop
+        ).explain()
+        self.assertIn("txn_budget_cat_date_idx (budget_id=? AND category_id=? AND date>? AND date<?)", plan)
+
+        plan = Expense.objects.filter(user=self.user, date__gte=start, date__lt=stop).order_by("date", "id").explain()
+        self.assertIn("expense_user_date_idx (user_id=? AND date>? AND date<?)", plan)
+
+    def test_reports_use_half_open_ranges(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from budget.reporting import monthly_by_category, monthly_kpis
+
+        with CaptureQueriesContext(connection) as ctx:
+            monthly_kpis(self.budget.id, year=2026, month=2)
+            monthly_by_category(self.budget.id, year=2026, month=2)
+        for q in ctx.captured_queries:
+            self.assertNotIn("django_date_extract", q["sql"])
+
+
+class RollupTests(Epic5Base):
+    def assertRollupMatches(self):
+        from budget.rollups import check
+        self.assertEqual(check(), [])
+
+    def test_rollup_follows_create_update_and_delete(self):
+        from budget.models import BudgetMonthCategoryRollup
+
+        feb = BudgetMonthCategoryRollup.objects.get(budget=self.budget, month=date(2026, 2, 1), category=self.rent)
+        self.assertEqual(feb.expense_total, Decimal("-900.00"))
+        self.assertEqual(feb.expense_count, 1)
+
+        rent = Transaction.objects.get(description="Rent")
+        rent.date = date(2026, 3, 1)
+        rent.category = self.misc
+        rent.amount = Decimal("-950.00")
+        rent.save()
+        self.assertRollupMatches()
+
+        Transaction.objects.filter(description="Groceries").delete()
+        self.assertRollupMatches()
+
+        self.food.delete()
+        self.misc.delete()  # its transactions become uncategorized
+        self.assertRollupMatches()
+
+        self.budget.delete()
+        self.assertFalse(BudgetMonthCategoryRollup.objects.exists())
+
+    def test_bulk_helpers_keep_rollup_in_step(self):
+        from budget.rollups import bulk_create_transactions, update_transactions
+
+        bulk_create_transactions([
+            Transaction(budget=self.budget, category=self.food, date=date(2026, 1, d),
+                        description="Snack", amount=Decimal("-5.00"))
+            for d in range(1, 11)
+        ])
+        self.assertRollupMatches()
+
+        update_transactions(Transaction.objects.filter(description="Snack"), category=self.misc)
+        self.assertRollupMatches()
+
+    def test_reports_agree_with_and_without_rollups(self):
+        from budget.reporting import monthly_by_category, monthly_kpis
+
+        Transaction.objects.create(budget=self.budget, category=None, date=date(2026, 2, 20),
+                                   description="Cash", amount=Decimal("-10.00"))
+        for args in ((), (2026, 2), (2026, 3)):
+            with override_settings(BUDGET_USE_ROLLUPS=True):
+                fast = (monthly_kpis(self.budget.id, *args), monthly_by_category(self.budget.id, *args))
+            with override_settings(BUDGET_USE_ROLLUPS=False):
+                slow = (monthly_kpis(self.budget.id, *args), monthly_by_category(self.budget.id, *args))
+            self.assertEqual(fast, slow)
+
+    def test_rebuild_command_detects_and_repairs_drift(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        # A raw update bypasses the rollup
+        Transaction.objects.filter(description="Rent").update(amount=Decimal("-1000.00"))
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", "--check", stdout=StringIO(), stderr=StringIO())
+
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertRollupMatches()
+
+
+    def test_zero_amount_transactions_leave_rollup_consistent(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from budget.models import BudgetMonthCategoryRollup
+
+        # e.g. a bank statement line with an empty amount cell
+        Transaction.objects.create(budget=self.budget, category=self.food, date=date(2026, 4, 1),
+                                   description="Fee waived", amount=Decimal("0"))
+        self.assertRollupMatches()
+        call_command("rebuild_rollups", stdout=StringIO())
+        call_command("rebuild_rollups", "--check", stdout=StringIO())
+        self.assertFalse(BudgetMonthCategoryRollup.objects.filter(month=date(2026, 4, 1)).exists())
+
+
+class ReportCacheTests(Epic5Base):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        super().setUp()
+
+    def test_repeat_reports_hit_the_cache(self):
+        from budget import report_cache
+
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_csv", args=[self.budget.id])
+        first = self.client.get(url).content
+        with self.assertNumQueries(3):  # session, user and budget lookups only
+            second = self.client.get(url).content
+        self.assertEqual(first, second)
+        stats = report_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+
+    def test_transaction_and_category_changes_invalidate(self):
+        from budget import report_cache
+
+        before = report_cache.monthly_kpis(self.budget.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(budget=self.budget, category=self.food, date=date(2026, 2, 20),
+                                       description="Takeaway", amount=Decimal("-50.00"))
+        after = report_cache.monthly_kpis(self.budget.id)
+        self.assertEqual(after["net"], before["net"] - 50)
+
+        version = report_cache.budget_version(self.budget.id)
+        self.food.name = "Groceries"
+        self.food.save()
+        self.assertGreater(report_cache.budget_version(self.budget.id), version)
+        self.assertIn("Groceries", [r["category"] for r in report_cache.monthly_by_category(self.budget.id)])
+
+    def test_bulk_helpers_invalidate(self):
+        from budget import report_cache
+        from budget.rollups import bulk_create_transactions
+
+        before = report_cache.monthly_kpis(self.budget.id)
+        bulk_create_transactions([
+            Transaction(budget=self.budget, category=self.food, date=date(2026, 2, 21),
+                        description="Snack", amount=Decimal("-5.00"))
+        ])
+        self.assertEqual(report_cache.monthly_kpis(self.budget.id)["net"], before["net"] - 5)
+
+    def test_stats_endpoint_is_staff_only(self):
+        url = reverse("reports_cache_stats")
+        self.client.login(username="derrick", password="pass123")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(set(self.client.get(url).json()), {"hits", "misses", "hit_rate"})
+
+    def test_invalidation_is_seen_by_other_processes(self):
+        import multiprocessing
+        from budget import report_cache
+
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork")
+        before = report_cache.budget_version(self.budget.id)
+        worker = multiprocessing.get_context("fork").Process(
+            target=report_cache.bump_budget_version, args=(self.budget.id,)
+        )
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        self.assertNotEqual(report_cache.budget_version(self.budget.id), before)
+
+    def test_tests_use_their_own_cache_directory(self):
+        from django.conf import settings
+        from django.core.cache import cache
+
+        self.assertNotEqual(cache._dir, os.path.abspath(settings.BASE_DIR / "cache"))
+
+    def test_counters_do_not_expire(self):
+        from unittest import mock
+        from budget import report_cache
+
+        report_cache.bump_budget_version(self.budget.id)
+        report_cache._count(report_cache.HITS_KEY)
+        version, hits = report_cache.budget_version(self.budget.id), report_cache.stats()["hits"]
+        # BaseCache.incr() would have re-set them with the 300 s default
+        with mock.patch("time.time", return_value=time.time() + 10 * 365 * 86400):
+            self.assertEqual(report_cache.budget_version(self.budget.id), version)
+            self.assertEqual(report_cache.stats()["hits"], hits)
+
+    def test_counters_lose_no_increments_between_processes(self):
+        import multiprocessing
+        from budget import report_cache
+
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.skipTest("needs fork")
+        report_cache._count(report_cache.HITS_KEY)
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_count_hits, args=(25,)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self.assertEqual([w.exitcode for w in workers], [0] * 4)
+        self.assertEqual(report_cache.stats()["hits"], 101)
+
+
+def _count_hits(n):
+    from budget import report_cache
+
+    for _ in range(n):
+        report_cache._count(report_cache.HITS_KEY)
+
+
+class FakeDate(date):
+    """date with a settable today() (module level, so cached reports can pickle it)."""
+
+    today_value = None
+
+    @classmethod
+    def today(cls):
+        return cls.today_value
+
+
+class ConditionalGetTests(Epic5Base):
+    def test_reports_answer_304_until_the_budget_changes(self):
+        self.client.login(username="derrick", password="pass123")
+        for name in ("reports_csv", "reports_recos"):
+            url = reverse(name, args=[self.budget.id])
+            etag = self.client.get(url)["ETag"]
+
+            with self.assertNumQueries(2):  # session + user; no report, not even the budget
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304)
+            # A different representation has its own ETag
+            self.assertNotEqual(self.client.get(url, {"detail": 1})["ETag"], etag)
+
+            Transaction.objects.create(budget=self.budget, category=self.food, date=date(2026, 2, 20),
+                                       description="Snack", amount=Decimal("-3.00"))
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 200)
+            self.assertNotEqual(resp["ETag"], etag)
+
+    def test_dashboard_etag_changes_with_the_month(self):
+        from unittest import mock
+
+        FakeDate.today_value = date(2026, 1, 31)
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_dashboard", args=[self.budget.id])
+        with mock.patch("budget.views_reports.date", FakeDate):
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            FakeDate.today_value = date(2026, 2, 1)
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["series"][-1]["period"], "2026-02-01")
+
+    def test_dashboard_rejects_out_of_range_months(self):
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_dashboard", args=[self.budget.id])
+        for month in ("0001-01", "9999-12", "2026-13"):
+            self.assertEqual(self.client.get(url, {"month": month}).status_code, 400, month)
+
+    def test_other_users_budget_is_still_404(self):
+        User.objects.create_user(username="mallory", password="pass123")
+        self.client.login(username="mallory", password="pass123")
+        url = reverse("reports_csv", args=[self.budget.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AsyncReportViewsTests(TransactionTestCase):
+    """
+    The async views run aggregations in worker threads with their own
+    connections, so the fixture has to be committed.
+    """
+
+    setUp = Epic5Base.setUp
+
+    async def _get(self, name, *params, **headers):
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        return await client.get(reverse(name, args=[self.budget.id]), *params, headers=headers)
+
+    async def test_async_views_match_sync_views(self):
+        from django.core.cache import cache
+
+        for sync_name, async_name in (
+            ("reports_csv", "async_reports_csv"),
+            ("reports_recos", "async_reports_recos"),
+            ("reports_dashboard", "async_reports_dashboard"),
+        ):
+            await cache.aclear()
+            resp = await self._get(async_name)
+            self.assertEqual(resp.status_code, 200)
+            await sync_to_async(self.client.force_login)(self.user)
+            expected = await sync_to_async(self.client.get)(reverse(sync_name, args=[self.budget.id]))
+            self.assertEqual(resp.content, expected.content)
+
+        dashboard = json.loads(resp.content)
+        self.assertEqual(len(dashboard["series"]), 12)
+        self.assertEqual(Decimal(dashboard["kpis"]["net"]), Decimal("850.00"))
+
+    async def test_async_304_and_streamed_ledger(self):
+        resp = await self._get("async_reports_dashboard")
+        again = await self._get("async_reports_dashboard", If_None_Match=resp["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+        resp = await self._get("async_reports_csv", {"detail": 1})
+        body = b"".join([chunk async for chunk in resp.streaming_content])
+        self.assertEqual(len(body.decode().splitlines()), 4)
+
+    async def test_async_what_if(self):
+        from django.test import AsyncClient
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        resp = await client.post(
+            reverse("async_reports_what_if", args=[self.budget.id]),
+            {"changes": [{"category": "Food", "delta": 50}]},
+            content_type="application/json",
+        )
+        self.assertEqual(Decimal(str(resp.json()["projected_net"])), Decimal("900.00"))
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_async_dashboard_against_wsgi(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        from django.test import AsyncClient
+
+        from budget.rollups import bulk_create_transactions
+
+        bulk_create_transactions([
+            Transaction(budget=self.budget, category=(self.food, self.rent, self.misc)[n % 3],
+                        date=date(2016 + n % 10, n % 12 + 1, n % 28 + 1), description="Row",
+                        amount=Decimal(n % 200 - 150))
+            for n in range(200_000)
+        ], batch_size=2000)
+        clients, rounds = 8, 4
+        url = reverse("reports_dashboard", args=[self.budget.id])
+        async_url = reverse("async_reports_dashboard", args=[self.budget.id])
+
+        def summary(label, latencies, elapsed):
+            latencies.sort()
+            print(f"{label}: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+                  f"max {latencies[-1] * 1000:.0f} ms, {len(latencies) / elapsed:.1f} req/s")
+
+        def wsgi_client(client):
+            latencies = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                self.assertEqual(client.get(url).status_code, 200)
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        async def asgi_clients(logged_in):
+            async def one(client):
+                latencies = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    self.assertEqual((await client.get(async_url)).status_code, 200)
+                    latencies.append(time.perf_counter() - started)
+                return latencies
+            return await asyncio.gather(*(one(client) for client in logged_in))
+
+        # Recompute every time: no report cache, no rollup table
+        with override_settings(
+            BUDGET_USE_ROLLUPS=False,
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+        ):
+            print(f"\ndashboard over 200k transactions, {clients} concurrent clients x {rounds} requests")
+            # Log in up front: concurrent session writes would lock SQLite
+            logged_in = [Client() for _ in range(clients)]
+            for client in logged_in:
+                client.force_login(self.user)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(clients) as pool:
+                latencies = sum(pool.map(wsgi_client, logged_in), [])
+            summary("  WSGI (sync, sequential parts)", latencies, time.perf_counter() - started)
+
+            logged_in = [AsyncClient() for _ in range(clients)]
+            for client in logged_in:
+                client.force_login(self.user)
+            started = time.perf_counter()
+            latencies = sum(asyncio.run(asgi_clients(logged_in)), [])
+            summary("  ASGI (async, concurrent parts)", latencies, time.perf_counter() - started)
+
+
 class ExportCsvTests(Epic5Base):
     """
     Covers user story 26 – export data in CSV format.
@@ -250,6 +1093,216 @@ class ExportCsvTests(Epic5Base):
         self.assertIn("Rent", content)
 
 
+class LedgerExportTests(Epic5Base):
+    def _get(self, **params):
+        self.client.login(username="derrick", password="pass123")
+        resp = self.client.get(reverse("reports_csv", args=[self.budget.id]), {"detail": 1, **params})
+        self.assertTrue(resp.streaming)
+        return resp, b"".join(resp.streaming_content)
+
+    def test_detail_export_streams_every_transaction(self):
+        resp, body = self._get()
+        self.assertEqual(resp["Content-Type"], "text/csv")
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0], "Date,Description,Category,Amount")
+        self.assertEqual(lines[1:], [
+            "2026-02-05,Paycheck,Misc,2000.00",
+            "2026-02-10,Rent,Rent,-900.00",
+            "2026-02-15,Groceries,Food,-250.00",
+        ])
+
+    def test_date_filters_and_gzip(self):
+        import gzip
+
+        resp, body = self._get(start="2026-02-10", end="2026-02-10", gzip=1)
+        self.assertEqual(resp["Content-Type"], "application/gzip")
+        self.assertIn("ledger.csv.gz", resp["Content-Disposition"])
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertEqual(lines[1:], ["2026-02-10,Rent,Rent,-900.00"])
+
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_csv", args=[self.budget.id])
+        self.assertEqual(self.client.get(url, {"detail": 1, "start": "2026-02-30"}).status_code, 400)
+
+    def test_open_ended_range_at_date_max(self):
+        resp, body = self._get(start="0001-01-01", end="9999-12-31")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(body.decode().splitlines()), 4)
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_million_row_export_memory_is_flat(self):
+        import tracemalloc
+        from datetime import timedelta
+
+        from django.db import connection
+
+        def insert(count):
+            # Straight SQL: building a million model instances would itself
+            # use more memory than the export under test
+            start = date(2000, 1, 1)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO budget_transaction (budget_id, category_id, date, description, amount) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    (
+                        (self.budget.id, self.food.id, start + timedelta(days=n // 100), f"Row {n}", "-1.25")
+                        for n in range(count)
+                    ),
+                )
+
+        def peak_while_streaming():
+            tracemalloc.start()
+            started = time.perf_counter()
+            resp = self.client.get(url, {"detail": 1, "gzip": 1})
+            size = 0
+            for chunk in resp.streaming_content:
+                size += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak, size, time.perf_counter() - started
+
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_csv", args=[self.budget.id])
+        insert(10_000)
+        small_peak, _, _ = peak_while_streaming()
+        insert(990_000)
+        big_peak, size, elapsed = peak_while_streaming()
+        print(f"\n1M-row export: {size / 1e6:.1f} MB gzipped in {elapsed:.1f}s, "
+              f"peak {big_peak / 1e6:.1f} MB traced (10k rows: {small_peak / 1e6:.1f} MB)")
+        self.assertLess(big_peak, small_peak * 2)
+
+
+class BankImportTests(Epic5Base):
+    CSV = (
+        "Date,Description,Amount,Category\n"
+        "2026-03-01,Coffee,-3.50,food\n"
+        "2026-03-01,Coffee,-3.50,food\n"
+        "2026-03-02,Train,-12.00,Travel\n"
+        "2026-03-31,Salary,2500.00,\n"
+        "2026-02-30,Broken,-1.00,\n"
+        "2026-02-10,Rent,-900.00,Rent\n"  # already in the fixture
+    )
+
+    def _import(self, text, fmt="csv", **kwargs):
+        from io import BytesIO
+        from budget.bank_import import import_statement
+        return import_statement(self.budget, BytesIO(text.encode()), fmt, **kwargs)
+
+    def test_csv_import_maps_categories_and_skips_duplicates(self):
+        from budget.rollups import check
+
+        result = self._import(self.CSV)
+        self.assertEqual((result.rows, result.created, result.duplicates, result.error_count), (5, 4, 1, 1))
+        self.assertEqual(result.errors[0][0], 6)  # the line number of the bad date
+        coffees = Transaction.objects.filter(budget=self.budget, description="Coffee")
+        self.assertEqual([t.category for t in coffees], [self.food, self.food])
+        self.assertIsNone(Transaction.objects.get(description="Train").category)
+        self.assertEqual(check(self.budget.id), [])
+
+        # Importing the same statement again adds nothing; a third coffee is new
+        again = self._import(self.CSV + "2026-03-01,Coffee,-3.50,food\n")
+        self.assertEqual((again.created, again.duplicates), (1, 5))
+        self.assertEqual(Transaction.objects.filter(description="Coffee").count(), 3)
+
+    def test_debit_credit_columns_and_new_categories(self):
+        text = (
+            "Posted Date,Payee,Debit,Credit,Category\n"
+            "03/05/2026,Market,25.10,,Groceries\n"
+            "03/06/2026,Refund,,5.00,Groceries\n"
+        )
+        result = self._import(text, date_format="%m/%d/%Y", create_categories=True)
+        self.assertEqual(result.created, 2)
+        groceries = Category.objects.get(budget=self.budget, name="Groceries")
+        self.assertEqual(
+            sorted(groceries.transactions.values_list("amount", flat=True)), [Decimal("-25.10"), Decimal("5.00")]
+        )
+
+    def test_blank_amounts_are_row_errors(self):
+        result = self._import("Date,Description,Amount\n2026-03-07,Mystery,\n2026-03-08,Tea,-2.00\n")
+        self.assertEqual((result.created, result.error_count), (1, 1))
+        self.assertEqual(result.errors[0], (2, "missing amount"))
+        self.assertFalse(Transaction.objects.filter(description="Mystery").exists())
+
+        # Split columns leave one side empty, but not both
+        result = self._import("Date,Description,Debit,Credit\n2026-03-07,Nothing,,\n2026-03-08,Tea,2.00,\n")
+        self.assertEqual((result.created, result.duplicates, result.error_count), (0, 1, 1))
+        self.assertEqual(result.errors[0], (2, "missing amount"))
+
+    def test_ofx_import(self):
+        ofx = (
+            "OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+            "<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20260304120000[-5:EST]\n<TRNAMT>-42.00\n<NAME>Hardware\n</STMTTRN>\n"
+            "<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20260305</DTPOSTED><TRNAMT>10</TRNAMT>"
+            "<MEMO>Interest</MEMO></STMTTRN>\n"
+            "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+        )
+        result = self._import(ofx, "ofx")
+        self.assertEqual(result.created, 2)
+        self.assertEqual(
+            list(Transaction.objects.filter(date__gte=date(2026, 3, 4)).order_by("date").values_list("description", "amount")),
+            [("Hardware", Decimal("-42.00")), ("Interest", Decimal("10.00"))],
+        )
+
+    def test_upload_endpoint_and_command(self):
+        import tempfile
+        from io import StringIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("import_statement", args=[self.budget.id])
+        upload = SimpleUploadedFile("march.csv", self.CSV.encode(), content_type="text/csv")
+        resp = self.client.post(url, {"file": upload})
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["created"], 4)
+        self.assertEqual(self.client.post(url, {}).status_code, 400)
+
+        statement = b"Date,Description,Amount,Category\n2026-03-03,Tickets,-30.00,Concerts\n"
+        for flag in ("false", "0", "off"):
+            upload = SimpleUploadedFile("tickets.csv", statement)
+            self.client.post(url, {"file": upload, "create_categories": flag})
+            self.assertFalse(Category.objects.filter(budget=self.budget, name="Concerts").exists(), flag)
+        upload = SimpleUploadedFile("tickets.csv", statement.replace(b"Tickets", b"Encore"))
+        self.client.post(url, {"file": upload, "create_categories": "true"})
+        self.assertTrue(Category.objects.filter(budget=self.budget, name="Concerts").exists())
+
+        User.objects.create_user(username="mallory", password="pass123")
+        self.client.login(username="mallory", password="pass123")
+        upload = SimpleUploadedFile("march.csv", self.CSV.encode())
+        self.assertEqual(self.client.post(url, {"file": upload}).status_code, 404)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(self.CSV + "2026-03-09,Books,-20.00,\n")
+        out = StringIO()
+        call_command("import_bank_statement", str(self.budget.id), f.name, stdout=out, stderr=StringIO())
+        os.remove(f.name)
+        self.assertIn("1 imported, 5 duplicates, 1 errors", out.getvalue())
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_hundred_thousand_rows(self):
+        from datetime import timedelta
+        from io import BytesIO
+
+        from budget.bank_import import import_statement
+
+        lines = ["Date,Description,Amount,Category"]
+        for n in range(100_000):
+            day = date(2016, 1, 1) + timedelta(days=n // 30)
+            lines.append(f"{day.isoformat()},Shop {n % 500},-{n % 97 + 1}.{n % 100:02d},{('Food', 'Rent', 'Misc')[n % 3]}")
+        data = "\n".join(lines).encode()
+
+        for label in ("first import", "re-import (all duplicates)"):
+            started = time.perf_counter()
+            result = import_statement(self.budget, BytesIO(data), "csv")
+            elapsed = time.perf_counter() - started
+            print(f"\n100k-row statement, {label}: {elapsed:.2f}s "
+                  f"({result.created} created, {result.duplicates} duplicates)")
+        self.assertEqual(result.duplicates, 100_000)
+
+
 class RecommendationsTests(Epic5Base):
     """
     Covers user story 27 – intelligent recommendations to balance overspending.
@@ -289,6 +1342,539 @@ class WhatIfSimulationTests(Epic5Base):
         self.assertEqual(Decimal(str(data["base"]["net"])), Decimal("850.00"))
         self.assertEqual(Decimal(str(data["delta"])), Decimal("50"))  # -50 + 100
         self.assertEqual(Decimal(str(data["projected_net"])), Decimal("900.00"))
+
+
+class PivotTests(Epic5Base):
+    def test_matrix_is_dense_and_matches_raw_query(self):
+        from budget.reporting import category_month_matrix
+
+        Transaction.objects.create(budget=self.budget, category=self.food, date=date(2025, 12, 3),
+                                   description="Feast", amount=Decimal("-75.50"))
+        for rollups in (True, False):
+            with override_settings(BUDGET_USE_ROLLUPS=rollups):
+                pivot = category_month_matrix(self.budget.id, months=3, end=date(2026, 2, 28))
+            self.assertEqual(pivot.months, [date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)])
+            self.assertEqual(pivot.categories, ["Food", "Rent"])
+            self.assertEqual(pivot.values.tolist(), [[75.5, 0, 250], [0, 0, 900]])
+
+    def test_pivot_endpoint_json_and_csv(self):
+        from datetime import timedelta
+
+        Transaction.objects.filter(budget=self.budget).delete()  # keep the window independent of today
+        Transaction.objects.create(budget=self.budget, category=self.food,
+                                   date=date.today() - timedelta(days=400), description="Old",
+                                   amount=Decimal("-5.00"))
+        Transaction.objects.create(budget=self.budget, category=self.rent, date=date.today(),
+                                   description="Rent", amount=Decimal("-10.00"))
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_pivot", args=[self.budget.id])
+
+        data = self.client.get(url).json()
+        self.assertEqual(len(data["months"]), 12)
+        self.assertEqual(data["months"][-1], date.today().strftime("%Y-%m"))
+        self.assertEqual(data["categories"], ["Rent"])  # the 400-day-old expense is outside
+        self.assertEqual(data["values"][0][-1], 10.0)
+
+        self.assertEqual(self.client.get(url, {"months": 24}).json()["categories"], ["Food", "Rent"])
+
+        resp = self.client.get(url, {"format": "csv"})
+        self.assertEqual(resp["Content-Type"], "text/csv")
+        lines = resp.content.decode().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "Category")
+        self.assertTrue(lines[1].startswith("Rent,") and lines[1].endswith(",10.0"))
+
+        self.assertEqual(self.client.get(url, {"months": 0}).status_code, 400)
+
+
+class HouseholdReportTests(Epic5Base):
+    def setUp(self):
+        super().setUp()
+        self.second = Budget.objects.create(user=self.user, name="Holiday Fund")
+        food = Category.objects.create(budget=self.second, name="Food")
+        Transaction.objects.create(budget=self.second, category=food, date=date(2026, 2, 7),
+                                   description="Picnic", amount=Decimal("-40.00"))
+        Transaction.objects.create(budget=self.second, category=None, date=date(2026, 3, 1),
+                                   description="Gift", amount=Decimal("300.00"))
+
+    def test_multi_budget_variants_match_single_budget_functions(self):
+        from budget import reporting
+
+        ids = [self.budget.id, self.second.id]
+        for rollups in (True, False):
+            for args in ((), (2026, 2), (2026, 3)):
+                with override_settings(BUDGET_USE_ROLLUPS=rollups):
+                    kpis = reporting.monthly_kpis_by_budget(ids, *args)
+                    cats = reporting.monthly_by_category_by_budget(ids, *args)
+                    recs = reporting.recommendations_by_budget(ids, 3, *args)
+                    for budget_id in ids:
+                        self.assertEqual(kpis[budget_id], reporting.monthly_kpis(budget_id, *args))
+                        self.assertEqual(cats[budget_id], reporting.monthly_by_category(budget_id, *args))
+                        self.assertEqual(recs[budget_id], reporting.recommendations(budget_id, 3, *args))
+
+    def test_household_endpoint_combines_budgets_in_constant_queries(self):
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_household")
+        # session, user, budgets, KPIs, categories
+        with self.assertNumQueries(5):
+            data = self.client.get(url).json()
+        self.assertEqual([b["name"] for b in data["budgets"]], ["Spring Budget", "Holiday Fund"])
+        self.assertEqual(Decimal(data["combined"]["kpis"]["net"]), Decimal("1110.00"))
+        food = [c for c in data["combined"]["by_category"] if c["category"] == "Food"]
+        self.assertEqual(Decimal(food[0]["total"]), Decimal("290.00"))
+
+        for n in range(3):
+            Budget.objects.create(user=self.user, name=f"Extra {n}")
+        with self.assertNumQueries(5):
+            data = self.client.get(url, {"month": "2026-03"}).json()
+        self.assertEqual(len(data["budgets"]), 5)
+        self.assertEqual(Decimal(data["combined"]["kpis"]["income"]), Decimal("300.00"))
+
+        self.assertEqual(self.client.get(url, {"month": "2026-13"}).status_code, 400)
+
+
+class WhatIfBatchTests(Epic5Base):
+    def test_batch_endpoint_projects_every_scenario(self):
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_what_if_batch", args=[self.budget.id])
+        payload = {
+            "scenarios": [
+                {"name": "food -10%", "changes": [{"category": "Food", "percent": -10}]},
+                {"name": "rent cap", "months": 3, "changes": [{"category": "Rent", "cap": 800}]},
+                {"name": "no food", "changes": [{"category": "Food", "amount": -300}]},
+            ]
+        }
+        resp = self.client.post(url, data=payload, content_type="application/json")
+        self.assertEqual(resp.status_code, 200)
+
+        data = resp.json()
+        self.assertEqual(data["categories"], ["Food", "Misc", "Rent"])
+        self.assertEqual(data["base"]["net"], 850)
+        food, rent, none = data["scenarios"]
+        self.assertEqual((food["projected_net"], food["delta"]), (875, 25))
+        self.assertEqual(food["expense"], [225, 0, 900])
+        self.assertEqual((rent["projected_net"], rent["delta"]), (2850, 300))
+        self.assertEqual(rent["expense"], [750, 0, 2400])
+        self.assertEqual(none["expense"][0], 0)  # spend never goes negative
+
+    def test_batch_rejects_unknown_category(self):
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_what_if_batch", args=[self.budget.id])
+        payload = {"scenarios": [{"changes": [{"category": "Boats", "percent": 5}]}]}
+        resp = self.client.post(url, data=payload, content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Boats", resp.json()["error"])
+
+    def test_batch_rejects_malformed_scenarios(self):
+        self.client.login(username="derrick", password="pass123")
+        url = reverse("reports_what_if_batch", args=[self.budget.id])
+        food = {"changes": [{"category": "Food", "percent": 5}]}
+        for payload in (
+            {"scenarios": [{"changes": [{"category": ["Food"], "percent": 5}]}]},
+            {"scenarios": [{"changes": 5}]},
+            {"scenarios": [{**food, "months": 1e308}]},
+            {"scenarios": [{**food, "months": 121}]},
+            {"scenarios": [food], "year": 0, "month": 1},
+            {"scenarios": [food], "year": 9999, "month": 12},
+        ):
+            resp = self.client.post(url, data=payload, content_type="application/json")
+            self.assertEqual(resp.status_code, 400, payload)
+
+    def test_evaluate_handles_thousands_of_scenarios(self):
+        from budget.scenarios import evaluate, load_baseline
+
+        baseline = load_baseline(self.budget.id)
+        scenarios = [{"changes": [{"category": "Rent", "percent": -p / 100}]} for p in range(5000)]
+        result = evaluate(baseline, scenarios)
+        self.assertEqual(result["expense"].shape, (5000, 3))
+        self.assertAlmostEqual(result["delta"][4999], 900 * 49.99 / 100)
+def _monthly_history(budget, categories, years, per_month=1, start_year=2020):
+    """Transactions for `years` of months: flat income, trending spend, December spike."""
+    from budget.rollups import bulk_create_transactions
+
+    income, *spend = categories
+    txns = []
+    for i in range(years * 12):
+        day = date(start_year + i // 12, i % 12 + 1, 1)
+        txns.append(Transaction(budget=budget, category=income, date=day,
+                                description="Pay", amount=Decimal("1000.00")))
+        amount = Decimal(100 + 2 * i + (60 if day.month == 12 else 0)) / per_month
+        for category in spend:
+            for n in range(per_month):
+                txns.append(Transaction(budget=budget, category=category, date=day.replace(day=n % 28 + 1),
+                                        description="Spend", amount=-amount.quantize(Decimal("0.01"))))
+    bulk_create_transactions(txns, batch_size=1000)
+    return txns
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username="fore", password="pass123")
+        self.budget = Budget.objects.create(user=self.user, name="Forecast")
+        self.salary = Category.objects.create(budget=self.budget, name="Salary")
+        self.food = Category.objects.create(budget=self.budget, name="Food")
+
+    def test_forecast_follows_trend_and_season(self):
+        from budget.forecast import fit, forecast
+
+        _monthly_history(self.budget, [self.salary, self.food], years=3)
+        model = fit(self.budget.id, as_of=date(2023, 1, 15))
+        self.assertEqual(model.categories, ["Food", "Salary"])
+        self.assertEqual(model.last_month, date(2022, 12, 1))
+
+        months = forecast(model, 12)
+        self.assertEqual(months[0]["month"], date(2023, 1, 1))
+        food = [m["expense"][0] for m in months]
+        self.assertAlmostEqual(food[0], 100 + 2 * 36, delta=5)
+        self.assertAlmostEqual(food[11] - food[10], 2 + 60, delta=5)  # December again
+        self.assertEqual([m["income"][1] for m in months], [1000.0] * 12)
+
+    def test_history_stops_before_the_current_month(self):
+        from budget.forecast import monthly_matrix
+
+        _monthly_history(self.budget, [self.salary, self.food], years=1)
+        matrix = monthly_matrix(self.budget.id, as_of=date(2020, 6, 30))
+        self.assertEqual(len(matrix.months), 5)
+        self.assertEqual(matrix.expense[:, 0].tolist(), [100, 102, 104, 106, 108])
+
+    def test_forecast_endpoint_is_cached_until_transactions_change(self):
+        from budget import report_cache
+
+        self.client.login(username="fore", password="pass123")
+        url = reverse("reports_forecast", args=[self.budget.id])
+        self.assertEqual(self.client.get(url).json()["forecast"], [])
+
+        from datetime import timedelta
+        last_month = date.today().replace(day=1) - timedelta(days=1)
+        Transaction.objects.create(budget=self.budget, category=self.food, date=last_month,
+                                   description="Spend", amount=Decimal("-40.00"))
+        data = self.client.get(url, {"horizon": 2}).json()
+        self.assertEqual(len(data["forecast"]), 2)
+        self.assertEqual(data["next_month"]["expense"], [40.0])
+        self.client.get(url, {"horizon": 5})
+        stats = report_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))  # refit only after the new transaction
+
+        self.assertEqual(self.client.get(url, {"horizon": 99}).status_code, 400)
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_forecast_ten_years(self):
+        from django.core.cache import cache
+        from budget.forecast import fit, forecast
+
+        categories = [self.salary] + [
+            Category.objects.create(budget=self.budget, name=f"Spend {n}") for n in range(11)
+        ]
+        txns = _monthly_history(self.budget, categories, years=12, per_month=10, start_year=2010)
+
+        cache.clear()
+        started = time.perf_counter()
+        model = fit(self.budget.id, as_of=date(2022, 1, 1))
+        forecast(model, 12)
+        elapsed = time.perf_counter() - started
+        print(f"\nforecast over {len(txns)} transactions (144 months x 12 categories): {elapsed * 1000:.1f} ms")
+        self.assertLess(elapsed, 1.0)
+
+
+def _production_db_profile():
+    """(DATABASES["default"], BUDGET_SQLITE_PRAGMAS) as settings.py builds them for production."""
+    import runpy
+    from unittest import mock
+
+    import family_budget.settings
+
+    with mock.patch.dict(os.environ, {"BUDGET_DB_PROFILE": "production"}):
+        namespace = runpy.run_path(family_budget.settings.__file__)
+    return namespace["DATABASES"]["default"], namespace["BUDGET_SQLITE_PRAGMAS"]
+
+
+class _SQLiteFile:
+    """Connections (one per thread) to a throwaway SQLite file, outside the test database."""
+
+    def __init__(self, path, db_settings=None):
+        from django.db.utils import ConnectionHandler
+
+        self.connections = ConnectionHandler(
+            {"default": {**(db_settings or {}), "ENGINE": "django.db.backends.sqlite3", "NAME": str(path)}}
+        )
+
+    def connection(self):
+        return self.connections["default"]
+
+    def close(self):
+        self.connections.close_all()
+
+
+class SQLiteProfileTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def test_production_profile(self):
+        db, pragmas = _production_db_profile()
+        self.assertEqual(db["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertGreater(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(pragmas["journal_mode"], "WAL")
+
+        db.pop("NAME")
+        database = _SQLiteFile(os.path.join(self._dir.name, "prod.sqlite3"), db)
+        self.addCleanup(database.close)
+        with self.settings(BUDGET_SQLITE_PRAGMAS=pragmas), database.connection().cursor() as cursor:
+            applied = {}
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store"):
+                cursor.execute(f"PRAGMA {name}")
+                applied[name] = cursor.fetchone()[0]
+        # synchronous NORMAL = 1, temp_store MEMORY = 2
+        self.assertEqual(applied, {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000,
+                                   "cache_size": pragmas["cache_size"], "temp_store": 2})
+
+    def test_default_profile_leaves_sqlite_alone(self):
+        from django.conf import settings
+
+        self.assertEqual(settings.BUDGET_SQLITE_PRAGMAS, {})
+        database = _SQLiteFile(os.path.join(self._dir.name, "dev.sqlite3"))
+        self.addCleanup(database.close)
+        with database.connection().cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "delete")
+
+    @tag("benchmark")
+    @skipUnless(os.environ.get("BUDGET_BENCHMARKS"), "set BUDGET_BENCHMARKS=1 to run")
+    def test_benchmark_concurrent_reads_and_writes(self):
+        """
+        4 writer and 4 reader threads for 3 s against a file database,
+        with Django's defaults and with the production profile. Writers
+        read then insert in one transaction (like a request that checks
+        before saving); readers run a GROUP BY report. Without
+        CONN_MAX_AGE each operation opens its own connection, as each
+        request would.
+        """
+        import threading
+        from django.db import OperationalError
+
+        prod_db, prod_pragmas = _production_db_profile()
+        prod_db.pop("NAME")
+        profiles = {
+            "default": ({}, {}),
+            "production": (prod_db, prod_pragmas),
+        }
+        results = {}
+        for name, (db_settings, pragmas) in profiles.items():
+            database = _SQLiteFile(os.path.join(self._dir.name, f"{name}.sqlite3"), db_settings)
+            self.addCleanup(database.close)
+            persistent = bool(db_settings.get("CONN_MAX_AGE"))
+            with self.settings(BUDGET_SQLITE_PRAGMAS=pragmas):
+                with database.connection().cursor() as cursor:
+                    cursor.execute("CREATE TABLE expense (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                                   "category TEXT, amount INTEGER, date TEXT)")
+                    cursor.execute("CREATE INDEX expense_user_date ON expense (user_id, date)")
+                    cursor.executemany(
+                        "INSERT INTO expense (user_id, category, amount, date) VALUES (%s, %s, %s, %s)",
+                        [(n % 50, f"Cat {n % 12}", n % 9000 + 100, f"2025-10-{n % 28 + 1:02d}")
+                         for n in range(50_000)],
+                    )
+                database.connection().close()
+
+                counts = {"writes": 0, "reads": 0, "locked": 0}
+                lock = threading.Lock()
+                stop = time.perf_counter() + 3
+
+                def work(n, write):
+                    conn = database.connection()
+                    while time.perf_counter() < stop:
+                        try:
+                            if write:
+                                with conn.cursor() as cursor:
+                                    # what atomic() sends for this connection's transaction_mode
+                                    cursor.execute(f"BEGIN {conn.transaction_mode or ''}")
+                                    try:
+                                        cursor.execute("SELECT COUNT(*) FROM expense WHERE user_id = %s", [n])
+                                        cursor.execute("INSERT INTO expense (user_id, category, amount, date) "
+                                                       "VALUES (%s, 'Food', 1250, '2025-10-15')", [n])
+                                    except OperationalError:
+                                        cursor.execute("ROLLBACK")
+                                        raise
+                                    cursor.execute("COMMIT")
+                            else:
+                                with conn.cursor() as cursor:
+                                    cursor.execute("SELECT category, SUM(amount), COUNT(*) FROM expense "
+                                                   "WHERE user_id = %s GROUP BY category", [n])
+                                    cursor.fetchall()
+                            key = "writes" if write else "reads"
+                        except OperationalError:
+                            key = "locked"
+                        with lock:
+                            counts[key] += 1
+                        if not persistent:
+                            conn.close()
+                    conn.close()
+
+                threads = [threading.Thread(target=work, args=(n, n % 2 == 0)) for n in range(8)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            results[name] = counts
+
+        print("\nconcurrent read/write, 3 s: " + "; ".join(
+            f"{name} {c['writes'] / 3:.0f} writes/s, {c['reads'] / 3:.0f} reads/s, {c['locked']} locked errors"
+            for name, c in results.items()
+        ))
+        self.assertEqual(results["production"]["locked"], 0)
+        self.assertGreater(results["production"]["writes"] + results["production"]["reads"],
+                           results["default"]["writes"] + results["default"]["reads"])
+
+
+@override_settings(BUDGET_REPLICA_DATABASE="replica")
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    The replica alias is a test mirror of the default database: a second
+    connection to the same data, so the fixture has to be committed.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username="replica", password="pass123")
+        Expense.objects.create(user=self.user, amount=50, category="Food", date=date(2025, 10, 1))
+        self.client.login(username="replica", password="pass123")
+
+    def _queries(self, method, url, data=None):
+        """The SQL run on (default, replica) while serving one request, each as one string."""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections["replica"]) as replica:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 300)
+        return ["\n".join(q["sql"] for q in captured.captured_queries) for captured in (primary, replica)]
+
+    def test_listing_reads_from_replica(self):
+        for url in (reverse("list_expenses"), reverse("expense_summary")):
+            primary, replica = self._queries("get", url, {"month": "2025-10"})
+            self.assertIn('"budget_expense"', replica)
+            self.assertNotIn('"budget_', primary)
+            # sessions and users always come from the primary
+            self.assertIn('"django_session"', primary)
+            self.assertNotIn('"django_session"', replica)
+
+    def test_reports_read_from_replica(self):
+        budget = Budget.objects.create(user=self.user, name="Home")
+        food = Category.objects.create(budget=budget, name="Food")
+        Transaction.objects.create(budget=budget, category=food, date=date(2025, 10, 2),
+                                   description="Shop", amount=Decimal("-12.00"))
+        primary, replica = self._queries("get", reverse("reports_dashboard", args=[budget.id]))
+        self.assertIn('"budget_budget"', replica)
+        self.assertIn('"budget_budgetmonthcategoryrollup"', replica)
+        self.assertNotIn('"budget_', primary)
+
+    def test_writer_reads_own_writes_from_primary(self):
+        from django.core.cache import cache
+        from budget.routers import PIN_COOKIE
+
+        self._queries("post", reverse("create_expense"), {"amount": "5", "category": "Bus"})
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        # the pin travels with the client, not with one process's cache
+        cache.clear()
+        primary, replica = self._queries("get", reverse("list_expenses"), {"month": "2025-10"})
+        self.assertIn('"budget_expense"', primary)
+        self.assertEqual(replica, "")
+
+        # once the pin expires, back to the replica
+        del self.client.cookies[PIN_COOKIE]
+        primary, replica = self._queries("get", reverse("list_expenses"), {"month": "2025-10"})
+        self.assertIn('"budget_expense"', replica)
+
+    def test_forged_pin_is_ignored(self):
+        from budget.routers import PIN_COOKIE
+
+        self.client.cookies[PIN_COOKIE] = "1"
+        primary, replica = self._queries("get", reverse("list_expenses"), {"month": "2025-10"})
+        self.assertIn('"budget_expense"', replica)
+
+    def test_replica_sync_drops_cached_reports_and_etags(self):
+        from unittest import mock
+        from budget import reporting
+        from budget.report_cache import bump_replica_generation
+
+        budget = Budget.objects.create(user=self.user, name="Home")
+        url = reverse("reports_dashboard", args=[budget.id])
+        etag = self.client.get(url)["ETag"]
+        with mock.patch("budget.reporting.monthly_kpis", wraps=reporting.monthly_kpis) as kpis:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.client.get(url)
+            kpis.assert_not_called()
+
+            # what was read from the replica before this sync may be stale
+            bump_replica_generation()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            kpis.assert_called()
+
+    async def test_async_reports_read_from_replica_in_worker_threads(self):
+        from unittest import mock
+        from django.test import AsyncClient
+        from budget.routers import ReplicaRouter
+
+        budget = await Budget.objects.acreate(user=self.user, name="Home")
+        routed, db_for_read = [], ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            routed.append((model._meta.app_label, alias))
+            return alias
+
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = await client.get(reverse("async_reports_dashboard", args=[budget.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({alias for app, alias in routed if app == "budget"}, {"replica"})
+        self.assertEqual({alias for app, alias in routed if app != "budget"}, {None})
+
+    @override_settings(BUDGET_REPLICA_DATABASE=None)
+    def test_without_replica_everything_uses_default(self):
+        primary, replica = self._queries("get", reverse("list_expenses"), {"month": "2025-10"})
+        self.assertIn('"budget_expense"', primary)
+        self.assertEqual(replica, "")
+
+    def test_no_migrations_on_replica(self):
+        from budget.routers import ReplicaRouter
+        self.assertFalse(ReplicaRouter().allow_migrate("replica", "budget"))
+        self.assertIsNone(ReplicaRouter().allow_migrate("default", "budget"))
+
+    def test_sync_replica_command(self):
+        import sqlite3
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from budget.report_cache import replica_generation
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "replica.sqlite3")
+            call_command("sync_replica", path=path, stdout=StringIO())
+            generation = replica_generation()
+            Expense.objects.create(user=self.user, amount=7, category="Food", date=date(2025, 10, 3))
+            call_command("sync_replica", path=path, stdout=StringIO())
+            replica = sqlite3.connect(path)
+            try:
+                self.assertEqual(replica.execute("SELECT SUM(amount) FROM budget_expense").fetchone()[0], 5700)
+            finally:
+                replica.close()
+            self.assertNotEqual(replica_generation(), generation)
+        # the test mirror is the primary itself
+        with self.assertRaises(CommandError):
+            call_command("sync_replica", stdout=StringIO())
+
+
 # ============================================================
 # 3) Epic 1 – User Accounts & Profile Management
 # ============================================================
@@ -320,39 +1906,424 @@ class UserAccountTest(TestCase):
 # Epic 2 — Income Management (Aryan)
 # Per-user JSON data storage test
 # ============================================================
-class UserDataStorageTest(TestCase):
+class LedgerTestCase(TestCase):
+    """
+    Points BUDGET_DATA_ROOT at a throwaway directory so ledger tests
+    never touch real user files.
+    """
+
     def setUp(self):
-        self.client = Client()
+        import tempfile
+
+        from budget.storage import ledger_cache_clear
+
+        self._data_root = tempfile.TemporaryDirectory()
+        self._root_override = override_settings(BUDGET_DATA_ROOT=self._data_root.name)
+        self._root_override.enable()
+        ledger_cache_clear()
 
     def tearDown(self):
-        # Clean up JSON files created by tests
-        for file in os.listdir('.'):
-            if file.endswith('_data.json'):
-                os.remove(file)
+        self._root_override.disable()
+        self._data_root.cleanup()
+
+    def _path(self, username, suffix="_data.json"):
+        from budget.storage import get_user_file
+        return get_user_file(username, suffix)
+
+
+class UserDataStorageTest(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
 
     def _login(self, username):
         # Simulate login
         resp = self.client.post(reverse("login"), {"username": username})
         self.assertEqual(resp.status_code, 302)
 
-    def _read_json(self, filename):
-        with open(filename, "r") as f:
+    def _read_json(self, username):
+        with open(self._path(username), "r") as f:
             return json.load(f)
 
     def test_data_is_separate_per_user(self):
         # First user
         self._login("Aryan")
         self.client.post(reverse("add_income"), {"source": "Job", "amount": "100"})
-        aryan_data = self._read_json("Aryan_data.json")
+        aryan_data = self._read_json("Aryan")
         self.assertEqual(aryan_data["total_income"], 100)
 
         # Second user
         self._login("Jamie")
         self.client.post(reverse("add_income"), {"source": "Gift", "amount": "200"})
-        jamie_data = self._read_json("Jamie_data.json")
+        jamie_data = self._read_json("Jamie")
         self.assertEqual(jamie_data["total_income"], 200)
 
         # Aryan's income should remain unchanged
-        aryan_data = self._read_json("Aryan_data.json")
+        aryan_data = self._read_json("Aryan")
         self.assertEqual(aryan_data["total_income"], 100)
 
+
+class IncomeIndexTest(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.post(reverse("login"), {"username": "Aryan"})
+
+    def test_list_shaped_ledger_is_indexed_by_id(self):
+        from budget.storage import load_user_data
+
+        path = self._path("Aryan")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Old format, including the duplicate id the len()+1 scheme could produce
+        with open(path, "w") as f:
+            json.dump({"income": [{"id": 1, "source": "A", "amount": 10.0},
+                                  {"id": 2, "source": "B", "amount": 20.0},
+                                  {"id": 2, "source": "C", "amount": 30.0}],
+                       "expenses": [], "total_income": 60.0, "total_expense": 0,
+                       "balance": 60.0}, f)
+
+        data = load_user_data("Aryan")
+        self.assertEqual(list(data["income"]), ["1", "2", "3"])
+        self.assertEqual(data["income"]["3"]["source"], "C")
+        self.assertEqual(data["next_income_id"], 4)
+
+    def test_entries_without_ids_are_numbered(self):
+        from budget.storage import load_user_data
+
+        path = self._path("Aryan")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"income": [{"id": None, "source": "A", "amount": 10.0},
+                                  {"id": 5, "source": "B", "amount": 20.0},
+                                  {"source": "C", "amount": 30.0}],
+                       "expenses": [], "total_income": 60.0, "total_expense": 0,
+                       "balance": 60.0}, f)
+
+        data = load_user_data("Aryan")
+        self.assertEqual({k: i["source"] for k, i in data["income"].items()}, {"5": "B", "6": "A", "7": "C"})
+        self.assertEqual(data["next_income_id"], 8)
+
+    def test_renumbered_duplicates_still_page_in_id_order(self):
+        path = self._path("Aryan")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"income": [{"id": n, "source": source, "amount": 1.0}
+                                  for n, source in ((1, "A"), (2, "B"), (2, "C"), (3, "D"))],
+                       "expenses": [], "total_income": 4.0, "total_expense": 0, "balance": 4.0}, f)
+
+        seen, params = [], {"limit": 3}
+        while True:
+            resp = self.client.get(reverse("view_income"), params)
+            seen += [i["source"] for i in resp.context["incomes"]]
+            if not resp.context["next_url"]:
+                break
+            params["after"] = resp.context["next_url"].split("after=")[1].split("&")[0]
+        # C was renumbered to 4, so it now sorts last
+        self.assertEqual(seen, ["A", "B", "D", "C"])
+
+    def test_edit_and_delete_by_id_keep_totals_in_step(self):
+        from budget.storage import load_user_data
+
+        for source, amount in (("Job", "100"), ("Gift", "50")):
+            self.client.post(reverse("add_income"), {"source": source, "amount": amount})
+
+        self.client.post(reverse("edit_income", args=[1]), {"source": "Job", "amount": "120"})
+        self.client.get(reverse("delete_income", args=[2]))
+        self.client.post(reverse("add_income"), {"source": "Bonus", "amount": "5"})
+
+        data = load_user_data("Aryan")
+        # Deleted ids are not handed out again
+        self.assertEqual(sorted(data["income"]), ["1", "3"])
+        self.assertEqual(data["total_income"], 125)
+        self.assertEqual(data["balance"], 125)
+
+
+class LedgerPagesTest(LedgerTestCase):
+    def setUp(self):
+        from budget.storage import save_user_data
+
+        super().setUp()
+        incomes = {
+            str(n): {"id": n, "source": f"Source {n}", "amount": 1.0,
+                     "date": f"2025-{(n - 1) // 10 + 1:02d}-15"}
+            for n in range(1, 26)
+        }
+        save_user_data("Aryan", {
+            "income": incomes, "next_income_id": 26,
+            "expenses": [{"category": f"Cat {n}", "amount": 1.0} for n in range(5)],
+            "total_income": 25.0, "total_expense": 5.0, "balance": 20.0,
+        })
+        self.client.post(reverse("login"), {"username": "Aryan"})
+
+    def test_income_list_pages_with_cursor(self):
+        resp = self.client.get(reverse("view_income"), {"limit": 10})
+        self.assertEqual([i["id"] for i in resp.context["incomes"]], list(range(1, 11)))
+        self.assertIn("after=10", resp.context["next_url"])
+
+        resp = self.client.get(reverse("view_income"), {"limit": 10, "after": 20})
+        self.assertEqual([i["id"] for i in resp.context["incomes"]], list(range(21, 26)))
+        self.assertIsNone(resp.context["next_url"])
+
+    def test_date_range_filters_entries(self):
+        resp = self.client.get(reverse("summary"), {"start": "2025-02-01", "end": "2025-02-28"})
+        self.assertEqual([i["id"] for i in resp.context["incomes"]], list(range(11, 21)))
+        # These expenses carry no date, so they fall outside any range
+        self.assertEqual(resp.context["expenses"], [])
+
+    def test_full_history_is_streamed(self):
+        resp = self.client.get(reverse("view_income"), {"all": 1})
+        self.assertTrue(resp.streaming)
+        body = b"".join(resp.streaming_content).decode()
+        self.assertEqual(body.count("<tr>"), 26)  # header row + 25 incomes
+        self.assertIn("Source 25", body)
+        self.assertTrue(body.rstrip().endswith("</div>"))
+
+
+class ShardedLayoutTest(LedgerTestCase):
+    def test_files_are_spread_over_hashed_directories(self):
+        from budget.storage import iter_usernames, save_user_data
+
+        for name in ("Aryan", "Jamie", "Kanyin"):
+            save_user_data(name, {"income": [], "expenses": [], "total_income": 0,
+                                  "total_expense": 0, "balance": 0})
+
+        path = self._path("Aryan")
+        rel = os.path.relpath(path, self._data_root.name).split(os.sep)
+        self.assertEqual(len(rel), 3)  # two shard levels + the file
+        self.assertTrue(all(len(part) == 2 for part in rel[:2]))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(sorted(iter_usernames()), ["Aryan", "Jamie", "Kanyin"])
+
+    def test_rejects_usernames_that_escape_the_root(self):
+        from budget.storage import get_user_file
+
+        with self.assertRaises(ValueError):
+            get_user_file("../evil")
+
+    def test_rebalance_moves_flat_files_into_shards(self):
+        import tempfile
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from budget.storage import load_user_data
+
+        with tempfile.TemporaryDirectory() as legacy:
+            with open(os.path.join(legacy, "jamie_data.json"), "w") as f:
+                json.dump({"income": [], "expenses": [], "total_income": 1000.0,
+                           "total_expense": 0, "balance": 1000.0}, f)
+
+            call_command("rebalance_user_data", "--source", legacy, stdout=StringIO())
+
+            self.assertFalse(os.path.exists(os.path.join(legacy, "jamie_data.json")))
+        self.assertTrue(os.path.exists(self._path("jamie")))
+        self.assertEqual(load_user_data("jamie")["total_income"], 1000.0)
+
+        # Changing the depth and rebalancing again re-shards in place
+        with override_settings(BUDGET_DATA_SHARD_DEPTH=1):
+            call_command("rebalance_user_data", "--source", self._data_root.name, stdout=StringIO())
+            self.assertEqual(load_user_data("jamie")["total_income"], 1000.0)
+
+
+class LedgerCacheTest(LedgerTestCase):
+    def test_repeated_loads_hit_the_cache(self):
+        from budget.storage import load_user_data, save_user_data, ledger_cache_info
+
+        save_user_data("cachetest", {"income": [], "expenses": [], "total_income": 5,
+                                     "total_expense": 0, "balance": 5})
+        load_user_data("cachetest")
+        data = load_user_data("cachetest")
+        self.assertEqual(data["total_income"], 5)
+        self.assertEqual(ledger_cache_info().hits, 2)
+        self.assertEqual(ledger_cache_info().misses, 0)
+
+        # Mutating the returned copy must not leak into the cache
+        data["income"]["1"] = {"id": 1}
+        self.assertEqual(load_user_data("cachetest")["income"], {})
+
+    def test_write_from_another_process_invalidates_entry(self):
+        from budget.storage import load_user_data, save_user_data, ledger_cache_info
+
+        save_user_data("cachetest", {"income": [], "expenses": [], "total_income": 5,
+                                     "total_expense": 0, "balance": 5})
+        # Simulate another worker rewriting the file behind our back
+        with open(self._path("cachetest"), "w") as f:
+            json.dump({"income": [], "expenses": [], "total_income": 70,
+                       "total_expense": 0, "balance": 70}, f)
+
+        self.assertEqual(load_user_data("cachetest")["total_income"], 70)
+        self.assertEqual(ledger_cache_info().misses, 1)
+
+
+@override_settings(BUDGET_LEDGER_BACKEND="budget.storage.JournalBackend")
+class JournalBackendTest(LedgerTestCase):
+    def _add_income(self, amount):
+        from budget.storage import load_user_data, save_user_data
+
+        data = load_user_data("journaltest")
+        new_id = data["next_income_id"]
+        data["income"][str(new_id)] = {"id": new_id, "amount": amount}
+        data["next_income_id"] += 1
+        data["total_income"] += amount
+        save_user_data("journaltest", data)
+
+    def test_saves_append_to_journal_and_replay(self):
+        from budget.storage import load_user_data, ledger_cache_clear
+
+        # A ledger written in the old single-file format
+        snapshot = self._path("journaltest")
+        os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+        with open(snapshot, "w") as f:
+            json.dump({"income": [{"id": 1, "amount": 10}], "expenses": [],
+                       "total_income": 10, "total_expense": 0, "balance": 10}, f)
+        snapshot_before = os.stat(snapshot).st_mtime_ns
+
+        self._add_income(20)
+        self._add_income(30)
+
+        with open(self._path("journaltest", "_data.journal")) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["seq"] for r in records], [1, 2])
+        # Only the new entry is written, not the whole income list
+        self.assertIn({"op": "update", "key": "income", "set": {"2": {"id": 2, "amount": 20}},
+                       "del": []}, records[0]["ops"])
+        self.assertEqual(os.stat(snapshot).st_mtime_ns, snapshot_before)
+
+        ledger_cache_clear()
+        data = load_user_data("journaltest")
+        self.assertEqual([i["amount"] for i in data["income"].values()], [10, 20, 30])
+        self.assertEqual(data["total_income"], 60)
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        from budget.storage import get_backend, load_user_data, ledger_cache_clear
+
+        journal = self._path("journaltest", "_data.journal")
+        self._add_income(5)
+        with override_settings(BUDGET_JOURNAL_COMPACT_BYTES=1):
+            self._add_income(7)
+            # The second save pushed the journal over the threshold
+            future = get_backend().schedule_compaction("journaltest")
+            if future is not None:
+                future.result()
+        for _ in range(50):
+            if not os.path.exists(journal):
+                break
+            time.sleep(0.01)
+
+        self.assertFalse(os.path.exists(journal))
+        with open(self._path("journaltest")) as f:
+            self.assertEqual(json.load(f)["total_income"], 12)
+
+        self._add_income(1)
+        ledger_cache_clear()
+        self.assertEqual(load_user_data("journaltest")["total_income"], 13)
+
+
+def _hammer_ledger(username, count):
+    """Worker for the stress test: `count` increments of one user's ledger."""
+    from budget.storage import update_user_data
+
+    def bump(data):
+        new_id = data["next_income_id"]
+        data["income"][str(new_id)] = {"id": new_id, "amount": 1}
+        data["next_income_id"] += 1
+        data["total_income"] += 1
+
+    for _ in range(count):
+        update_user_data(username, bump)
+
+
+class ConcurrentLedgerWriteTest(LedgerTestCase):
+    """Many threads and processes updating one user must not lose writes."""
+
+    username = "stresstest"
+    threads = 8
+    processes = 3
+    per_worker = 25
+
+    def _hammer(self):
+        import multiprocessing
+        import threading
+
+        from budget.storage import ledger_cache_clear, load_user_data
+
+        workers = []
+        expected = self.threads * self.per_worker
+        if "fork" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("fork")
+            workers += [
+                ctx.Process(target=_hammer_ledger, args=(self.username, self.per_worker))
+                for _ in range(self.processes)
+            ]
+            expected += self.processes * self.per_worker
+        workers += [
+            threading.Thread(target=_hammer_ledger, args=(self.username, self.per_worker))
+            for _ in range(self.threads)
+        ]
+
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        ledger_cache_clear()
+        data = load_user_data(self.username)
+        self.assertEqual(data["total_income"], expected)
+        self.assertEqual(len(data["income"]), expected)
+        self.assertEqual([i["id"] for i in data["income"].values()], list(range(1, expected + 1)))
+
+    def test_json_backend_loses_no_updates(self):
+        from budget.storage import group_commit_info
+
+        commits_before, updates_before = group_commit_info()
+        self._hammer()
+        commits, updates = group_commit_info()
+        # Threads in this process share commits
+        self.assertLess(commits - commits_before, updates - updates_before)
+
+    @override_settings(BUDGET_LEDGER_BACKEND="budget.storage.JournalBackend",
+                       BUDGET_JOURNAL_COMPACT_BYTES=4096)
+    def test_journal_backend_loses_no_updates(self):
+        self._hammer()
+
+
+class ImportJsonLedgersCommandTest(LedgerTestCase):
+    def setUp(self):
+        from budget.storage import save_user_data
+
+        super().setUp()
+        self.user = User.objects.create_user(username="Aryan", password="pass123")
+        save_user_data("Aryan", {
+            "income": [{"id": 1, "source": "Job", "amount": 100.0, "contributor": "Aryan",
+                        "planned": True, "date": "2025-11-12"}],
+            "expenses": [{"category": "Food", "amount": 40.0}],
+            "total_income": 100.0, "total_expense": 40.0, "balance": 60.0,
+        })
+        save_user_data("Jamie", {
+            "income": [{"id": 1, "source": "Gift", "amount": 200.0},
+                       {"id": 2, "source": "Job", "amount": 50.0, "date": ""}],
+            "expenses": [],
+            "total_income": 250.0, "total_expense": 0, "balance": 250.0,
+        })
+
+    def test_import_copies_entries_and_is_idempotent(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from budget.models import Income, LedgerImport
+
+        out = StringIO()
+        call_command("import_json_ledgers", "--batch-size", "1", "--files-per-transaction", "1", stdout=out)
+        self.assertIn("rows/s", out.getvalue())
+
+        self.assertEqual(Income.objects.count(), 3)
+        self.assertEqual(Expense.objects.count(), 1)
+        expense = Expense.objects.get()
+        self.assertEqual(expense.user, self.user)
+        self.assertEqual(Income.objects.get(source="Job", amount=100.0).date_added.date(), date(2025, 11, 12))
+        self.assertEqual(LedgerImport.objects.get(username="Jamie").incomes, 2)
+
+        # Running again must not duplicate anything
+        call_command("import_json_ledgers", stdout=StringIO())
+        self.assertEqual(Income.objects.count(), 3)
+        self.assertEqual(Expense.objects.count(), 1)
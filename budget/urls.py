@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from . import views_reports
+from . import views_reports_async
 from . import views_api   # NEW: API views for Expense tests
 
 urlpatterns = [
@@ -37,6 +38,18 @@ urlpatterns = [
         views_reports.reports_what_if,
         name='reports_what_if'
     ),
+    path(
+        'reports/<int:budget_id>/what_if/batch/',
+        views_reports.reports_what_if_batch,
+        name='reports_what_if_batch'
+    ),
+
+    # Forecast
+    path(
+        'reports/<int:budget_id>/forecast/',
+        views_reports.reports_forecast,
+        name='reports_forecast'
+    ),
 
     # Recommendations
     path(
@@ -45,6 +58,56 @@ urlpatterns = [
         name='reports_recos'
     ),
 
+    # Category x month matrix
+    path(
+        'reports/<int:budget_id>/pivot/',
+        views_reports.reports_pivot,
+        name='reports_pivot'
+    ),
+
+    # Everything the dashboard shows, in one response
+    path(
+        'reports/<int:budget_id>/dashboard/',
+        views_reports.reports_dashboard,
+        name='reports_dashboard'
+    ),
+
+    # Async versions (ASGI): independent aggregations run concurrently
+    path(
+        'async/reports/<int:budget_id>/csv/',
+        views_reports_async.reports_csv,
+        name='async_reports_csv'
+    ),
+    path(
+        'async/reports/<int:budget_id>/what_if/',
+        views_reports_async.reports_what_if,
+        name='async_reports_what_if'
+    ),
+    path(
+        'async/reports/<int:budget_id>/recommendations/',
+        views_reports_async.reports_recommendations,
+        name='async_reports_recos'
+    ),
+    path(
+        'async/reports/<int:budget_id>/dashboard/',
+        views_reports_async.reports_dashboard,
+        name='async_reports_dashboard'
+    ),
+
+    # All of the user's budgets together
+    path(
+        'reports/household/',
+        views_reports.reports_household,
+        name='reports_household'
+    ),
+
+    # Report cache hit/miss counters
+    path(
+        'reports/cache/stats/',
+        views_reports.reports_cache_stats,
+        name='reports_cache_stats'
+    ),
+
     # ---------------------------------------------------------
     # Expense API endpoints used by tests
     # ---------------------------------------------------------
@@ -54,9 +117,24 @@ urlpatterns = [
         views_api.create_expense,
         name='create_expense'
     ),
+    path(
+        'api/expenses/bulk/',
+        views_api.create_expenses_bulk,
+        name='create_expenses_bulk'
+    ),
+    path(
+        'api/budgets/<int:budget_id>/import/',
+        views_api.import_statement,
+        name='import_statement'
+    ),
     path(
         'api/expenses/',
         views_api.list_expenses,
         name='list_expenses'
     ),
+    path(
+        'api/expenses/summary/',
+        views_api.expense_summary,
+        name='expense_summary'
+    ),
 ]
@@ -1,24 +1,129 @@
+from datetime import date as date_cls
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect
-from .models import Income, Expense
-import json
-import os
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+from django.utils.safestring import mark_safe
+from .storage import load_user_data, update_user_data  # per-user JSON data
+
 
-# Helper functions to handle per-user data
-def get_user_file(username):
-    return f"{username}_data.json"
+# -------------------------------------------
+# LEDGER PAGES (summary + income list)
+# -------------------------------------------
+# Long-lived ledgers are shown a page at a time. The cursor is the id of
+# the last income shown (ids only grow) or the index of the last expense
+# shown (expenses are only ever appended), so a page never shifts when
+# entries are added meanwhile. ?all=1 streams the whole history instead.
+
+STREAM_CHUNK = 200
+
+
+def _page_size(request):
+    default = getattr(settings, "BUDGET_LEDGER_PAGE_SIZE", 50)
+    try:
+        size = int(request.GET.get("limit", default))
+    except ValueError:
+        size = default
+    return max(1, min(size, 500))
+
+
+def _cursor(request, name):
+    try:
+        return int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _date_range(request):
+    """Inclusive (start, end) ISO strings from ?start=&end=, or None."""
+    start = parse_date(request.GET.get("start") or "")
+    end = parse_date(request.GET.get("end") or "")
+    return (start.isoformat() if start else None, end.isoformat() if end else None)
+
+
+def _in_range(entry, start, end):
+    if start is None and end is None:
+        return True
+    # Entries without a date can't be placed in a range
+    day = entry.get("date")
+    if not day:
+        return False
+    return (start is None or day >= start) and (end is None or day <= end)
+
+
+def _income_rows(user_data, after=None):
+    """(cursor, entry) pairs for incomes, oldest first."""
+    for key, entry in user_data["income"].items():
+        cursor = int(key)
+        if after is None or cursor > after:
+            yield cursor, entry
+
+
+def _expense_rows(user_data, after=None):
+    """(cursor, entry) pairs for expenses, oldest first."""
+    first = 0 if after is None else after + 1
+    return enumerate(islice(user_data["expenses"], first, None), start=first)
+
+
+def _filtered(rows, start, end):
+    return ((cursor, entry) for cursor, entry in rows if _in_range(entry, start, end))
+
+
+def _take_page(rows, limit, start, end):
+    """First `limit` entries in range, plus the cursor to continue from."""
+    page = []
+    last = None
+    for cursor, entry in rows:
+        if not _in_range(entry, start, end):
+            continue
+        if len(page) == limit:
+            return page, last
+        page.append(entry)
+        last = cursor
+    return page, None
+
+
+def _page_url(request, name, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params[name] = cursor
+    return "?" + params.urlencode()
+
+
+def _stream_page(template, context, sections):
+    """
+    Stream `template`, replacing each section marker with rows rendered
+    a chunk at a time, so the browser gets the page head immediately
+    and memory stays flat however long the history is.
+
+    sections: list of (context_key, row_template, rows_context_key, rows)
+    """
+    for key, _row_template, rows_key, _rows in sections:
+        context[key] = mark_safe(f"<!--stream:{key}-->")
+        context[rows_key] = []
+    context["streaming"] = True
+    page = render_to_string(template, context)
+
+    def generate():
+        rest = page
+        for key, row_template, rows_key, rows in sections:
+            head, rest = rest.split(f"<!--stream:{key}-->", 1)
+            yield head
+            rows = iter(rows)
+            while True:
+                chunk = [entry for _cursor, entry in islice(rows, STREAM_CHUNK)]
+                if not chunk:
+                    break
+                yield render_to_string(row_template, {rows_key: chunk})
+        yield rest
+
+    return StreamingHttpResponse(generate(), content_type="text/html; charset=utf-8")
 
-def load_user_data(username):
-    filename = get_user_file(username)
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            return json.load(f)
-    else:
-        return {"income": [], "expenses": [], "total_income": 0, "total_expense": 0, "balance": 0}
 
-def save_user_data(username, data):
-    filename = get_user_file(username)
-    with open(filename, "w") as f:
-        json.dump(data, f)
 
 # -------------------------------------------
 # LOGIN
@@ -67,22 +172,27 @@ def add_income_view(request):
         date = request.POST.get("date")
 
         if source and amount:
-            user_data = load_user_data(username)
-
-            new_entry = {
-                "id": len(user_data["income"]) + 1,
-                "source": source,
-                "amount": float(amount),
-                "contributor": contributor,
-                "planned": planned,
-                "date": date
-            }
-
-            user_data["income"].append(new_entry)
-            user_data["total_income"] += float(amount)
-            user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
+            amount = float(amount)
+
+            def add(user_data):
+                # Ids come from a counter, so they are never reused after a delete
+                new_id = user_data["next_income_id"]
+                user_data["next_income_id"] = new_id + 1
+
+                new_entry = {
+                    "id": new_id,
+                    "source": source,
+                    "amount": amount,
+                    "contributor": contributor,
+                    "planned": planned,
+                    "date": date
+                }
+
+                user_data["income"][str(new_id)] = new_entry
+                user_data["total_income"] += amount
+                user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
 
-            save_user_data(username, user_data)
+            update_user_data(username, add)
 
             return redirect('dashboard')
 
@@ -112,21 +222,28 @@ def add_expense_view(request):
         if category and amount:
             try:
                 amount_float = float(amount)
-                user_data = load_user_data(username)
-                
-                # Budget validation using JSON data
-                if user_data["total_expense"] + amount_float > user_data["total_income"]:
-                    error_message = "Error: Expense exceeds your available budget!"
-                else:
+            except ValueError:
+                error_message = "Invalid amount entered."
+            else:
+                def add(user_data):
+                    # Budget validation using JSON data (checked inside the
+                    # commit so two concurrent expenses can't both slip in)
+                    if user_data["total_expense"] + amount_float > user_data["total_income"]:
+                        return "Error: Expense exceeds your available budget!"
                     # Add expense to user's JSON data
-                    expense_item = {"category": category, "amount": amount_float}
+                    expense_item = {
+                        "category": category,
+                        "amount": amount_float,
+                        "date": date_cls.today().isoformat(),
+                    }
                     user_data["expenses"].append(expense_item)
                     user_data["total_expense"] += amount_float
                     user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
-                    save_user_data(username, user_data)
+                    return None
+
+                error_message = update_user_data(username, add)
+                if error_message is None:
                     return redirect('dashboard')
-            except ValueError:
-                error_message = "Invalid amount entered."
 
     context = {
         "username": username,
@@ -135,13 +252,6 @@ def add_expense_view(request):
         "amount_value": amount_value,
     }
     return render(request, "add_expense.html", context)
-            user_data = load_user_data(username)
-            expense_item = {"category": category, "amount": float(amount)}
-            user_data["expenses"].append(expense_item)
-            user_data["total_expense"] += float(amount)
-            user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
-            save_user_data(username, user_data)
-            return redirect('dashboard')
 
 
 
@@ -155,15 +265,38 @@ def summary_view(request):
         return redirect('login')
 
     user_data = load_user_data(username)
+    start, end = _date_range(request)
 
     context = {
         "username": username,
-        "incomes": user_data["income"],
-        "expenses": user_data["expenses"],
         "total_income": user_data["total_income"],
         "total_expense": user_data["total_expense"],
         "balance": user_data["balance"],
+        "start": start,
+        "end": end,
     }
+
+    if request.GET.get("all"):
+        return _stream_page("summary.html", context, [
+            ("income_stream", "_summary_incomes.html", "incomes",
+             _filtered(_income_rows(user_data), start, end)),
+            ("expense_stream", "_summary_expenses.html", "expenses",
+             _filtered(_expense_rows(user_data), start, end)),
+        ])
+
+    limit = _page_size(request)
+    incomes, next_income = _take_page(
+        _income_rows(user_data, _cursor(request, "income_after")), limit, start, end
+    )
+    expenses, next_expense = _take_page(
+        _expense_rows(user_data, _cursor(request, "expense_after")), limit, start, end
+    )
+    context.update({
+        "incomes": incomes,
+        "expenses": expenses,
+        "next_incomes_url": _page_url(request, "income_after", next_income),
+        "next_expenses_url": _page_url(request, "expense_after", next_expense),
+    })
     return render(request, "summary.html", context)
 
 
@@ -180,10 +313,23 @@ def view_income(request):
         return redirect('login')
 
     user_data = load_user_data(username)
-    return render(request, "view_income.html", {
-        "username": username,
-        "incomes": user_data["income"],
+    start, end = _date_range(request)
+    context = {"username": username, "start": start, "end": end}
+
+    if request.GET.get("all"):
+        return _stream_page("view_income.html", context, [
+            ("income_stream", "_income_rows.html", "incomes",
+             _filtered(_income_rows(user_data), start, end)),
+        ])
+
+    incomes, next_cursor = _take_page(
+        _income_rows(user_data, _cursor(request, "after")), _page_size(request), start, end
+    )
+    context.update({
+        "incomes": incomes,
+        "next_url": _page_url(request, "after", next_cursor),
     })
+    return render(request, "view_income.html", context)
 
 
 # -------------------------------------------
@@ -194,27 +340,34 @@ def edit_income(request, income_id):
     if not username:
         return redirect('login')
 
+    if request.method == "POST":
+        changes = {
+            "source": request.POST.get("source"),
+            "amount": float(request.POST.get("amount")),
+            "contributor": request.POST.get("contributor"),
+            "planned": request.POST.get("planned") == "on",
+            "date": request.POST.get("date"),
+        }
+
+        def edit(user_data):
+            # Find entry
+            income_item = user_data["income"].get(str(income_id))
+            if income_item:
+                # Update totals by the change instead of re-adding everything
+                user_data["total_income"] += changes["amount"] - income_item["amount"]
+                user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
+                income_item.update(changes)
+
+        update_user_data(username, edit)
+        return redirect('view_income')
+
     user_data = load_user_data(username)
 
     # Find entry
-    income_item = next((i for i in user_data["income"] if i["id"] == income_id), None)
+    income_item = user_data["income"].get(str(income_id))
     if not income_item:
         return redirect('view_income')
 
-    if request.method == "POST":
-        income_item["source"] = request.POST.get("source")
-        income_item["amount"] = float(request.POST.get("amount"))
-        income_item["contributor"] = request.POST.get("contributor")
-        income_item["planned"] = request.POST.get("planned") == "on"
-        income_item["date"] = request.POST.get("date")
-
-        # Recalculate totals
-        user_data["total_income"] = sum(i["amount"] for i in user_data["income"])
-        user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
-
-        save_user_data(username, user_data)
-        return redirect('view_income')
-
     return render(request, "edit_income.html", {
         "username": username,
         "income": income_item,
@@ -229,14 +382,13 @@ def delete_income(request, income_id):
     if not username:
         return redirect('login')
 
-    user_data = load_user_data(username)
-
-    user_data["income"] = [i for i in user_data["income"] if i["id"] != income_id]
-
-    # Recalculate totals
-    user_data["total_income"] = sum(i["amount"] for i in user_data["income"])
-    user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
+    def delete(user_data):
+        income_item = user_data["income"].pop(str(income_id), None)
+        if income_item:
+            # Update totals by the removed amount
+            user_data["total_income"] -= income_item["amount"]
+            user_data["balance"] = user_data["total_income"] - user_data["total_expense"]
 
-    save_user_data(username, user_data)
+    update_user_data(username, delete)
 
     return redirect('view_income')
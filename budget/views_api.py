@@ -1,9 +1,64 @@
 # budget/views_api.py
 
-from django.http import JsonResponse
+import json
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition
+
+from . import bank_import, report_cache
+from .models import Budget, Expense
+from .report_cache import expense_version, invalidate_expenses
+from .reporting import SUMMARY_GROUPS, month_range
+from .routers import replica_reads
+
+MAX_AMOUNT = Decimal("99999999.99")
+
+
+def _expenses_etag(request, *args, **kwargs):
+    """ETag from the user's expense version counter (no queries)."""
+    if not request.user.is_authenticated:
+        return None
+    version = expense_version(request.user.pk)
+    return f"{request.user.pk}-{version}-{zlib.crc32(request.get_full_path().encode()):x}"
+
+
+def _clean_expense(data):
+    """
+    Validate one expense (a dict of submitted values).
+    Returns (fields, None) or (None, error message).
+    """
+    try:
+        # via str(), so a JSON 0.1 is Decimal("0.1") and not its binary expansion
+        amount = Decimal(str(data.get("amount")))
+        amount = amount.quantize(Decimal("0.01")) if amount.is_finite() else -1
+    except (InvalidOperation, ValueError):
+        amount = -1  # force invalid
+    category = str(data.get("category") or "").strip()
+    note = str(data.get("note") or "")
 
-from .models import Expense
+    if not 0 < amount <= MAX_AMOUNT or category == "":
+        return None, "Invalid expense data"
+    if len(category) > 100 or len(note) > 255:
+        return None, "Category or note too long"
+
+    day = timezone.now().date()
+    if data.get("date"):
+        try:
+            day = parse_date(str(data["date"]))
+        except ValueError:
+            day = None
+        if day is None:
+            return None, "Invalid date"
+
+    return {"amount": amount, "category": category, "note": note, "date": day}, None
 
 
 def create_expense(request):
@@ -20,76 +75,339 @@ def create_expense(request):
     if not request.user.is_authenticated:
         return JsonResponse({"detail": "Forbidden"}, status=403)
 
-    # Extract data
-    amount_raw = request.POST.get("amount")
-    category = (request.POST.get("category") or "").strip()
-    note = request.POST.get("note", "")
-
-    # Basic validation
-    try:
-        amount = float(amount_raw)
-    except (TypeError, ValueError):
-        amount = -1  # force invalid
-
-    if amount <= 0 or category == "":
-        return JsonResponse({"detail": "Invalid expense data"}, status=400)
-
-    exp = Expense.objects.create(
-        user=request.user,
-        amount=amount,
-        category=category,
-        note=note,
-        date=timezone.now().date(),
+    fields, error = _clean_expense(
+        {
+            "amount": request.POST.get("amount"),
+            "category": request.POST.get("category"),
+            "note": request.POST.get("note", ""),
+        }
     )
+    if error:
+        return JsonResponse({"detail": error}, status=400)
+
+    exp = Expense.objects.create(user=request.user, **fields)
 
     return JsonResponse(
         {
             "id": exp.id,
             "category": exp.category,
-            "amount": exp.amount,
+            "amount": float(exp.amount),
             "note": exp.note,
         },
         status=201,
     )
 
 
+def _bulk_items(request):
+    """
+    Yield the submitted expenses: a JSON array, or NDJSON (one object per
+    line, Content-Type application/x-ndjson) read line by line.
+    Invalid JSON items are yielded as None.
+    """
+    if request.content_type == "application/x-ndjson":
+        for line in request:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+
+    items = json.loads(request.body or "[]")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array")
+    yield from items
+
+
+def create_expenses_bulk(request):
+    """
+    Create many expenses in one request (offline sync).
+
+    POST a JSON array of {"amount", "category", "note", "date"} objects,
+    or the same objects as NDJSON. Every item is validated like
+    create_expense; the valid ones are inserted together in one
+    transaction. The response lists a result per item, in order:
+    {"index": i, "id": ...} or {"index": i, "error": ...}.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+
+    limit = getattr(settings, "BUDGET_BULK_EXPENSES_MAX", 50000)
+    # user_id, not user=request.user: assigning the lazy user object to
+    # every instance dominates the cost of a large batch
+    user_id = request.user.pk
+    results, expenses = [], []
+    try:
+        for index, item in enumerate(_bulk_items(request)):
+            if index >= limit:
+                return JsonResponse({"detail": f"At most {limit} expenses per request"}, status=400)
+            fields, error = _clean_expense(item) if isinstance(item, dict) else (None, "Invalid expense data")
+            if error:
+                results.append({"index": index, "error": error})
+            else:
+                results.append({"index": index})
+                expenses.append(Expense(user_id=user_id, **fields))
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON"}, status=400)
+
+    with transaction.atomic():
+        created = Expense.objects.bulk_create(expenses, batch_size=1000)
+    # bulk_create() sends no signals
+    if created:
+        invalidate_expenses(user_id)
+
+    ids = iter(e.id for e in created)
+    for result in results:
+        if "error" not in result:
+            result["id"] = next(ids)
+    return JsonResponse({"created": len(created), "failed": len(results) - len(created), "results": results})
+
+
+def import_statement(request, budget_id):
+    """
+    Upload a bank statement into a budget.
+
+    POST multipart with "file" (CSV or OFX), and optionally "format"
+    (csv/ofx; default from the file name), "date_format" (strptime
+    format for CSV dates) and "create_categories" (1/true/on). Rows
+    already in the budget are skipped. Returns the import counts and any
+    bad lines.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+
+    budget = Budget.objects.filter(id=budget_id, user=request.user).first()
+    if budget is None:
+        return JsonResponse({"detail": "Not found"}, status=404)
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return JsonResponse({"detail": "No file uploaded"}, status=400)
+    fmt = request.POST.get("format") or bank_import.detect_format(upload.name)
+    if fmt not in bank_import.PARSERS:
+        return JsonResponse({"detail": f"Unknown format {fmt!r}"}, status=400)
+
+    try:
+        result = bank_import.import_statement(
+            budget,
+            upload,
+            fmt,
+            date_format=request.POST.get("date_format") or None,
+            create_categories=request.POST.get("create_categories", "").lower() in ("1", "true", "on"),
+        )
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    return JsonResponse(result.as_dict(), status=201 if result.created else 200)
+
+
+EXPENSE_FIELDS = ("id", "category", "amount", "note", "date")
+
+# Pages larger than this are streamed instead of built in memory
+STREAM_ABOVE = 200
+
+
+def _expense_json(row):
+    item = dict(zip(EXPENSE_FIELDS, row))
+    item["date"] = item["date"].isoformat()
+    item["amount"] = float(item["amount"])  # a JSON number, as before
+    return json.dumps(item)
+
+
+def _parse_cursor(value):
+    """'YYYY-MM-DD_id' -> (date, id); ValueError if malformed."""
+    day, _, pk = value.partition("_")
+    day = parse_date(day)
+    if day is None:
+        raise ValueError(value)
+    return day, int(pk)
+
+
+def _expense_filters(request):
+    """
+    Q objects for ?month=YYYY-MM, ?start=&end= (inclusive ISO dates)
+    and ?category= (repeatable), all of which combine.
+    ValueError if any is malformed.
+    """
+    filters = []
+    if request.GET.get("month"):
+        year, month = (int(part) for part in request.GET["month"].split("-"))
+        start, stop = month_range(year, month)
+        filters.append(Q(date__gte=start, date__lt=stop))
+    for param, lookup in (("start", "date__gte"), ("end", "date__lte")):
+        if request.GET.get(param):
+            day = parse_date(request.GET[param])
+            if day is None:
+                raise ValueError(param)
+            filters.append(Q(**{lookup: day}))
+    categories = request.GET.getlist("category")
+    if categories:
+        filters.append(Q(category__in=categories))
+    return filters
+
+
+def _stream_array(rows):
+    """A JSON array, STREAM_ABOVE rows per chunk."""
+    yield "["
+    chunk = []
+    for n, row in enumerate(rows):
+        chunk.append(("," if n else "") + _expense_json(row))
+        if len(chunk) == STREAM_ABOVE:
+            yield "".join(chunk)
+            chunk = []
+    yield "".join(chunk) + "]"
+
+
+@replica_reads
+@condition(etag_func=_expenses_etag)
 def list_expenses(request):
     """
-    List expenses for a given month for the logged-in user.
+    List the logged-in user's expenses, oldest first, a page at a time.
 
     Expected by ExpenseListTests:
       - GET with ?month=YYYY-MM
       - returns only that month's expenses
       - unauthenticated -> 403
+
+    Filters: ?month=YYYY-MM, ?start=&end= (inclusive), ?category=
+    (repeatable); without any filter the list is empty. Pages hold
+    ?limit= rows (default BUDGET_EXPENSE_PAGE_SIZE). When there are more,
+    the X-Next-Cursor and Link headers give the ?cursor= for the next
+    page; the cursor is the (date, id) of the last row, so every page is
+    an index range scan however deep it is.
     """
     if not request.user.is_authenticated:
         return JsonResponse({"detail": "Forbidden"}, status=403)
 
-    month_str = request.GET.get("month")
-    if not month_str:
+    try:
+        filters = _expense_filters(request)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid month, date or category filter"}, status=400)
+    if not filters:
         return JsonResponse([], safe=False)
 
+    page_size = getattr(settings, "BUDGET_EXPENSE_PAGE_SIZE", 100)
     try:
-        year_str, mon_str = month_str.split("-")
-        year = int(year_str)
-        month = int(mon_str)
+        limit = min(int(request.GET.get("limit", page_size)), 1000)
+        cursor = _parse_cursor(request.GET["cursor"]) if request.GET.get("cursor") else None
     except ValueError:
-        return JsonResponse({"detail": "Invalid month format"}, status=400)
+        return JsonResponse({"detail": "Invalid limit or cursor"}, status=400)
+    if limit < 1:
+        return JsonResponse({"detail": "Invalid limit or cursor"}, status=400)
 
-    qs = Expense.objects.filter(
-        user=request.user,
-        date__year=year,
-        date__month=month,
-    ).order_by("date", "id")
+    qs = Expense.objects.filter(*filters, user=request.user)
+    if cursor:
+        day, pk = cursor
+        qs = qs.filter(Q(date__gt=day) | Q(date=day, id__gt=pk))
+    qs = qs.order_by("date", "id")
 
-    data = [
+    if limit <= STREAM_ABOVE:
+        rows = list(qs.values_list(*EXPENSE_FIELDS)[: limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+        last = (rows[-1][4], rows[-1][0]) if more else None
+        response = HttpResponse(
+            "[" + ",".join(_expense_json(row) for row in rows) + "]",
+            content_type="application/json",
+        )
+    else:
+        # Find the page's last key first (an index-only query), so the
+        # next-page header can be sent before the rows are streamed
+        edge = list(qs.values_list("date", "id")[limit - 1: limit + 1])
+        last = edge[0] if len(edge) > 1 else None
+        page = qs
+        if last:
+            # End the page at that key, so it matches the cursor even if
+            # rows are added meanwhile
+            page = qs.filter(Q(date__lt=last[0]) | Q(date=last[0], id__lte=last[1]))
+        # Streamed after the view returns, outside replica_reads(): pin
+        # the database the edge query used
+        page = page.using(qs.db)
+        response = StreamingHttpResponse(
+            _stream_array(page.values_list(*EXPENSE_FIELDS)[:limit].iterator(chunk_size=STREAM_ABOVE)),
+            content_type="application/json",
+        )
+
+    if last:
+        query = request.GET.copy()
+        query["cursor"] = f"{last[0].isoformat()}_{last[1]}"
+        response["X-Next-Cursor"] = query["cursor"]
+        response["Link"] = f'<{request.path}?{query.urlencode()}>; rel="next"'
+    return response
+
+
+# Zero-filled day/week/month groups per summary (a bit under three years of days)
+SUMMARY_MAX_PERIODS = 1000
+
+_PERIOD_DAYS = {"day": 1, "week": 7, "month": 28}
+
+
+def _summary_range(request):
+    """
+    (start, end), inclusive, from ?month=YYYY-MM or ?start=&end=;
+    ValueError if missing, malformed or ending on date.max (like
+    month_range(), which has no stop date for December 9999).
+    """
+    if request.GET.get("month"):
+        year, month = (int(part) for part in request.GET["month"].split("-"))
+        start, stop = month_range(year, month)
+        return start, stop - timedelta(days=1)
+    start = parse_date(request.GET.get("start") or "")
+    end = parse_date(request.GET.get("end") or "")
+    if start is None or end is None or start > end or end == date.max:
+        raise ValueError("range")
+    return start, end
+
+
+@replica_reads
+@condition(etag_func=_expenses_etag)
+def expense_summary(request):
+    """
+    Totals and counts of the logged-in user's expenses, aggregated in SQL.
+
+    GET with ?month=YYYY-MM or ?start=&end= (inclusive), ?group_by=
+    category (default), day, week or month, and optionally ?category=
+    (repeatable). Returns {"start", "end", "group_by", "total", "count",
+    "groups": [{"key", "total", "count"}, ...]}; time groups cover every
+    period in the range, zeros included. Cached per user until their
+    expenses change, with the same ETags as list_expenses.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Forbidden"}, status=403)
+
+    group_by = request.GET.get("group_by", "category")
+    if group_by not in SUMMARY_GROUPS:
+        return JsonResponse({"detail": f"group_by must be one of {', '.join(SUMMARY_GROUPS)}"}, status=400)
+    try:
+        start, end = _summary_range(request)
+    except (ValueError, OverflowError):
+        return JsonResponse({"detail": "Give ?month=YYYY-MM or both ?start= and ?end="}, status=400)
+    if group_by != "category" and (end - start).days // _PERIOD_DAYS[group_by] >= SUMMARY_MAX_PERIODS:
+        return JsonResponse({"detail": f"Range too long for group_by={group_by}"}, status=400)
+
+    summary = report_cache.expense_summary(request.user.pk, start, end, group_by, request.GET.getlist("category"))
+    groups = [
         {
-            "category": e.category,
-            "amount": e.amount,
-            "note": e.note,
-            "date": e.date.isoformat(),
+            "key": g["key"] if group_by == "category" else g["key"].isoformat(),
+            "total": float(g["total"]),
+            "count": g["count"],
         }
-        for e in qs
+        for g in summary["groups"]
     ]
-
-    return JsonResponse(data, safe=False, status=200)
+    return JsonResponse(
+        {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "group_by": group_by,
+            "total": float(summary["total"]),
+            "count": summary["count"],
+            "groups": groups,
+        }
+    )
@@ -2,31 +2,49 @@
 
 import json
 import csv
+import io
+import zlib
+from datetime import date, timedelta
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition
 
-from .models import Budget
-from .reporting import monthly_kpis, monthly_by_category, what_if, recommendations
+from .models import Budget, Transaction
+from . import forecast, report_cache, reporting, scenarios
+from .report_cache import monthly_kpis, monthly_by_category, what_if, recommendations
+from .routers import replica_reads
 
 
-@login_required
-def reports_csv(request, budget_id):
+def _etag(user_pk, budget_id, path):
     """
-    CSV export for budget summary.
-
-    Tests check:
-      - status 200
-      - Content-Type == text/csv
-      - content contains 'Income', 'Expense', 'Food', 'Rent'
+    ETag from the budget's version counter: one cache read, no queries.
+    The query string is part of it since it changes the representation.
     """
-    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    version = report_cache.budget_version(budget_id)
+    return f"{user_pk}-{budget_id}-{version}-{zlib.crc32(path.encode()):x}"
 
-    # Use all transactions for this budget (tests only care about totals)
-    kpi = monthly_kpis(budget.id)
-    by_cat = monthly_by_category(budget.id)
 
+def _budget_etag(request, budget_id, **kwargs):
+    return _etag(request.user.pk, budget_id, request.get_full_path())
+
+
+def _month_param(request):
+    """(year, month) from ?month=YYYY-MM, (None, None) without it; ValueError if malformed."""
+    if not request.GET.get("month"):
+        return None, None
+    year, month = (int(part) for part in request.GET["month"].split("-"))
+    # Reports look back a year and forward a month from it
+    if not date.min.year < year < date.max.year:
+        raise ValueError(f"year {year} out of range")
+    reporting.month_range(year, month)
+    return year, month
+
+
+def _summary_csv(budget, kpi, by_cat):
     response = HttpResponse(content_type="text/csv")
     response[
         "Content-Disposition"
@@ -45,6 +63,100 @@ def reports_csv(request, budget_id):
     return response
 
 
+@replica_reads
+@login_required
+@condition(etag_func=_budget_etag)
+def reports_csv(request, budget_id):
+    """
+    CSV export for budget summary (?detail=1 for the full ledger).
+
+    Tests check:
+      - status 200
+      - Content-Type == text/csv
+      - content contains 'Income', 'Expense', 'Food', 'Rent'
+    """
+    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    if request.GET.get("detail"):
+        return _ledger_csv(request, budget)
+
+    # Use all transactions for this budget (tests only care about totals)
+    kpi = monthly_kpis(budget.id)
+    by_cat = monthly_by_category(budget.id)
+    return _summary_csv(budget, kpi, by_cat)
+
+
+def _ledger_rows(budget, start, end, chunk_size):
+    """Every transaction as a CSV row tuple, read chunk_size rows at a time."""
+    qs = Transaction.objects.filter(budget=budget)
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    # Rows are read after the view returns, outside replica_reads(): pin
+    # the database chosen for this request now
+    return (
+        qs.using(qs.db)
+        .order_by("date", "id")
+        .values_list("date", "description", "category__name", "amount")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _csv_chunks(rows, chunk_size):
+    """Encode rows as CSV, yielding one bytes chunk per chunk_size rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Date", "Description", "Category", "Amount"])
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _ledger_csv(request, budget, stream=iter):
+    """
+    Full transaction ledger as a streamed CSV (?detail=1), optionally
+    limited to ?start=&end= (inclusive ISO dates) and gzipped (?gzip=1).
+    Memory use doesn't grow with the ledger: rows are read from a
+    server-side iterator and written out in chunks. `stream` wraps the
+    chunk iterator (the async views pass an async adapter).
+    """
+    try:
+        start = parse_date(request.GET.get("start") or "")
+        end = parse_date(request.GET.get("end") or "")
+    except ValueError:
+        start = end = None
+    for name, value in (("start", start), ("end", end)):
+        if request.GET.get(name) and value is None:
+            return JsonResponse({"error": f"{name} must be a YYYY-MM-DD date"}, status=400)
+
+    chunk_size = getattr(settings, "BUDGET_EXPORT_CHUNK_SIZE", 2000)
+    chunks = _csv_chunks(_ledger_rows(budget, start, end, chunk_size), chunk_size)
+    filename = f"budget_{budget.id}_ledger.csv"
+    if request.GET.get("gzip"):
+        response = StreamingHttpResponse(stream(_gzipped(chunks)), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(stream(chunks), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@replica_reads
 @login_required
 def reports_what_if(request, budget_id):
     """
@@ -69,7 +181,197 @@ def reports_what_if(request, budget_id):
     return JsonResponse(result)
 
 
+@replica_reads
+@login_required
+def reports_what_if_batch(request, budget_id):
+    """
+    Evaluate many what-if scenarios against one baseline.
+
+    POST JSON {"scenarios": [...], "year": 2026, "month": 2}
+    (year/month optional; see budget/scenarios.py for the scenario format).
+    """
+    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    items = payload.get("scenarios")
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "scenarios must be a non-empty list"}, status=400)
+    limit = getattr(settings, "BUDGET_WHAT_IF_MAX_SCENARIOS", 10000)
+    if len(items) > limit:
+        return JsonResponse({"error": f"at most {limit} scenarios per request"}, status=400)
+
+    year, month = payload.get("year"), payload.get("month")
+    if (year is None) != (month is None) or not all(
+        v is None or (isinstance(v, int) and not isinstance(v, bool)) for v in (year, month)
+    ) or (month is not None and not 1 <= month <= 12):
+        return JsonResponse({"error": "year and month must be given together as integers"}, status=400)
+    if year is not None:
+        try:
+            reporting.month_range(year, month)
+        except (ValueError, OverflowError):
+            return JsonResponse({"error": "year out of range"}, status=400)
+    baseline = report_cache.cached_report("baseline", budget.id, scenarios.load_baseline, year, month)
+    try:
+        result = scenarios.run_scenarios(baseline, items)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(result)
+
+
+@replica_reads
+@login_required
+def reports_forecast(request, budget_id):
+    """
+    Per-category income and spend forecast.
+
+    GET ?horizon=N (1-24 months, default 3). Also returns next_month and
+    next_quarter totals per category.
+    """
+    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    try:
+        horizon = int(request.GET.get("horizon", 3))
+    except ValueError:
+        horizon = 0
+    if not 1 <= horizon <= 24:
+        return JsonResponse({"error": "horizon must be between 1 and 24"}, status=400)
+
+    as_of = date.today().replace(day=1)
+    model = report_cache.cached_report("forecast", budget.id, forecast.fit, as_of)
+    if model is None:
+        return JsonResponse({"categories": [], "forecast": [], "next_month": None, "next_quarter": None})
+
+    months = forecast.forecast(model, max(horizon, 3))
+
+    def total(rows):
+        return {
+            key: [round(sum(values), 2) for values in zip(*(r[key] for r in rows))]
+            for key in ("income", "expense")
+        }
+
+    return JsonResponse({
+        "categories": model.categories,
+        "history_until": model.last_month,
+        "forecast": months[:horizon],
+        "next_month": total(months[:1]),
+        "next_quarter": total(months[:3]),
+    })
+
+
+@replica_reads
+@login_required
+def reports_pivot(request, budget_id):
+    """
+    Category x month expense matrix for a rolling window.
+
+    GET ?months=N (1-60, default 12), ?format=csv for a CSV download.
+    """
+    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    try:
+        months = int(request.GET.get("months", 12))
+    except ValueError:
+        months = 0
+    if not 1 <= months <= 60:
+        return JsonResponse({"error": "months must be between 1 and 60"}, status=400)
+
+    pivot = report_cache.cached_report(
+        "pivot", budget.id, reporting.category_month_matrix, months, date.today().replace(day=1)
+    )
+    labels = [m.strftime("%Y-%m") for m in pivot.months]
+    values = pivot.values.round(2).tolist()
+
+    if request.GET.get("format") == "csv":
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="budget_{budget.id}_pivot.csv"'
+        writer = csv.writer(response)
+        writer.writerow(["Category", *labels])
+        writer.writerows([name, *row] for name, row in zip(pivot.categories, values))
+        return response
+
+    return JsonResponse({"months": labels, "categories": pivot.categories, "values": values})
+
+
+def _dashboard_path(request):
+    """
+    The path the dashboard's ETag is made from. Without ?month= the
+    12-month window ends this month, so the month is part of it.
+    """
+    path = request.get_full_path()
+    if not request.GET.get("month"):
+        path += f"#{date.today():%Y-%m}"
+    return path
+
+
+def _dashboard_etag(request, budget_id, **kwargs):
+    return _etag(request.user.pk, budget_id, _dashboard_path(request))
+
+
+def _dashboard_parts(budget_id, year=None, month=None):
+    """
+    The independent computations behind the dashboard, as
+    {name: (function, args)}, so they can run one after another (WSGI)
+    or concurrently (views_reports_async).
+    """
+    last = date(year, month, 1) if year is not None else date.today().replace(day=1)
+    first = date(last.year, 1, 1) if last.month == 12 else date(last.year - 1, last.month + 1, 1)
+    series_end = reporting.month_range(last.year, last.month)[1] - timedelta(days=1)
+    return {
+        "kpis": (monthly_kpis, (budget_id, year, month)),
+        "by_category": (monthly_by_category, (budget_id, year, month)),
+        "recommendations": (recommendations, (budget_id, 3, year, month)),
+        "series": (report_cache.cached_report, ("series", budget_id, reporting.kpi_series, first, series_end)),
+    }
+
+
+@replica_reads
+@login_required
+@condition(etag_func=_dashboard_etag)
+def reports_dashboard(request, budget_id):
+    """
+    KPIs, category spend, recommendations and the last 12 months of
+    KPIs in one response. GET ?month=YYYY-MM (optional).
+    """
+    budget = get_object_or_404(Budget, id=budget_id, user=request.user)
+    try:
+        year, month = _month_param(request)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid month format"}, status=400)
+    parts = _dashboard_parts(budget.id, year, month)
+    return JsonResponse({"budget": budget.name, **{name: fn(*args) for name, (fn, args) in parts.items()}})
+
+
+@replica_reads
+@login_required
+def reports_household(request):
+    """
+    Consolidated report over every budget the user owns.
+
+    GET ?month=YYYY-MM (optional; all time otherwise)
+    """
+    try:
+        year, month = _month_param(request)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid month format"}, status=400)
+
+    budgets = dict(Budget.objects.filter(user=request.user).order_by("id").values_list("id", "name"))
+    report = reporting.household_report(list(budgets), year=year, month=month)
+    return JsonResponse({
+        "budgets": [
+            {"id": budget_id, "name": name, **report["budgets"][budget_id]}
+            for budget_id, name in budgets.items()
+        ],
+        "combined": report["combined"],
+    })
+
+
+@replica_reads
 @login_required
+@condition(etag_func=_budget_etag)
 def reports_recommendations(request, budget_id):
     """
     Optional: expose recommendations via JSON.
@@ -77,3 +379,13 @@ def reports_recommendations(request, budget_id):
     budget = get_object_or_404(Budget, id=budget_id, user=request.user)
     recs = recommendations(budget.id)
     return JsonResponse({"recommendations": recs})
+
+
+@login_required
+def reports_cache_stats(request):
+    """
+    Report cache hit/miss counters (staff only).
+    """
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse(report_cache.stats())
@@ -0,0 +1,133 @@
+# budget/views_reports_async.py
+
+"""
+Async versions of the views_reports endpoints, for the ASGI stack
+(family_budget/asgi.py).
+
+Each report is made of independent aggregations (KPIs, category spend,
+recommendations, ...). The sync views run them one after another; these
+run them concurrently, each in its own worker thread with its own
+database connection. The budget and user lookups use the async ORM.
+Results still go through the versioned report cache and the same ETags.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import report_cache
+from .models import Budget
+from .routers import replica_reads
+from .views_reports import _dashboard_parts, _dashboard_path, _etag, _ledger_csv, _month_param, _summary_csv
+
+
+def _in_worker(fn, *args):
+    try:
+        return fn(*args)
+    finally:
+        # Worker threads aren't request threads, so nothing else closes
+        # their connections; honour CONN_MAX_AGE here instead
+        close_old_connections()
+
+
+async def _gather(*calls):
+    """Run (function, args) pairs concurrently in worker threads."""
+    return await asyncio.gather(
+        *(sync_to_async(_in_worker, thread_sensitive=False)(fn, *args) for fn, args in calls)
+    )
+
+
+async def _not_modified(request, user, budget_id, path=None):
+    """
+    (304 response or None, etag). Done by hand rather than with
+    condition(), whose etag function can't await the user.
+    """
+    path = path or request.get_full_path()
+    etag = quote_etag(await sync_to_async(_etag)(user.pk, budget_id, path))
+    return get_conditional_response(request, etag=etag), etag
+
+
+def _with_etag(response, etag):
+    response.headers.setdefault("ETag", etag)
+    return response
+
+
+async def _aiter(chunks):
+    # One sync thread for the whole stream, so the database cursor behind
+    # the chunks is always used from the thread that opened it
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+@replica_reads
+@login_required
+async def reports_csv(request, budget_id):
+    """Async reports_csv (summary, or ?detail=1 for the streamed ledger)."""
+    user = await request.auser()
+    not_modified, etag = await _not_modified(request, user, budget_id)
+    if not_modified:
+        return not_modified
+    budget = await aget_object_or_404(Budget, id=budget_id, user=user)
+
+    if request.GET.get("detail"):
+        return _with_etag(_ledger_csv(request, budget, stream=_aiter), etag)
+
+    kpi, by_cat = await _gather(
+        (report_cache.monthly_kpis, (budget.id,)),
+        (report_cache.monthly_by_category, (budget.id,)),
+    )
+    return _with_etag(_summary_csv(budget, kpi, by_cat), etag)
+
+
+@replica_reads
+@login_required
+async def reports_recommendations(request, budget_id):
+    user = await request.auser()
+    not_modified, etag = await _not_modified(request, user, budget_id)
+    if not_modified:
+        return not_modified
+    budget = await aget_object_or_404(Budget, id=budget_id, user=user)
+    (recs,) = await _gather((report_cache.recommendations, (budget.id,)))
+    return _with_etag(JsonResponse({"recommendations": recs}), etag)
+
+
+@replica_reads
+@login_required
+async def reports_what_if(request, budget_id):
+    user = await request.auser()
+    budget = await aget_object_or_404(Budget, id=budget_id, user=user)
+
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        payload = {}
+
+    (result,) = await _gather((report_cache.what_if, (budget.id, payload.get("changes", []))))
+    return JsonResponse(result)
+
+
+@replica_reads
+@login_required
+async def reports_dashboard(request, budget_id):
+    """Async reports_dashboard: every part is computed concurrently."""
+    user = await request.auser()
+    not_modified, etag = await _not_modified(request, user, budget_id, _dashboard_path(request))
+    if not_modified:
+        return not_modified
+    budget = await aget_object_or_404(Budget, id=budget_id, user=user)
+    try:
+        year, month = _month_param(request)
+    except ValueError:
+        return JsonResponse({"detail": "Invalid month format"}, status=400)
+
+    parts = _dashboard_parts(budget.id, year, month)
+    results = await _gather(*parts.values())
+    return _with_etag(JsonResponse({"budget": budget.name, **dict(zip(parts, results))}), etag)
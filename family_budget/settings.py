@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'budget.routers.replica_request_middleware',
 ]
 
 ROOT_URLCONF = 'family_budget.urls'
@@ -81,6 +83,70 @@ DATABASES = {
     }
 }
 
+# BUDGET_DB_PROFILE=production (environment variable) switches SQLite to
+# the tuned profile below; anything else keeps Django's defaults.
+BUDGET_DB_PROFILE = os.environ.get('BUDGET_DB_PROFILE', 'development')
+
+# PRAGMAs run on every new SQLite connection (budget/db.py)
+BUDGET_SQLITE_PRAGMAS = {}
+
+if BUDGET_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        # Keep connections (and their PRAGMAs and page cache) between requests
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts: a read that
+            # later upgrades to a write fails at once with "database is
+            # locked" in WAL mode, instead of waiting for busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+    BUDGET_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',         # readers and the writer don't block each other
+        'synchronous': 'NORMAL',       # fsync at checkpoints, not every commit (safe with WAL)
+        'busy_timeout': 5000,          # ms to wait for the write lock
+        'cache_size': -64000,          # page cache per connection, in KiB (64 MB)
+        'mmap_size': 256 * 1024 ** 2,  # read the file through a 256 MB memory map
+        'temp_store': 'MEMORY',        # sorts and GROUP BY temp tables in memory
+    }
+
+# Read replica (budget/routers.py): with BUDGET_DB_REPLICA=<file>, the
+# report and listing views read from that copy of the database. Keep it
+# up to date with `python manage.py sync_replica --interval 5`. Without
+# it the alias just points at the primary and nothing reads from it.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('BUDGET_DB_REPLICA') or DATABASES['default']['NAME'],
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['budget.routers.ReplicaRouter']
+BUDGET_REPLICA_DATABASE = 'replica' if os.environ.get('BUDGET_DB_REPLICA') else None
+
+# After writing, a client reads its own writes from the primary for this
+# many seconds (a signed cookie). Keep it above the replica's lag (the
+# sync interval).
+BUDGET_REPLICA_PIN_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# One cache shared by every worker process on the host (not Django's
+# per-process default), so the report cache versions and ETags
+# (budget/report_cache.py) are invalidated everywhere at once. For more
+# than one host, point this at Redis or Memcached instead.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('BUDGET_CACHE_DIR', BASE_DIR / 'cache'),
+        'OPTIONS': {
+            # Culling removes entries at random, version counters included
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,3 +188,54 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Per-user JSON ledgers (budget/storage.py)
+
+# Where ledgers are stored, and how many levels of hash-named
+# subdirectories they are spread over (0 = all in one directory).
+# After changing either, run `python manage.py rebalance_user_data`.
+BUDGET_DATA_ROOT = BASE_DIR / 'user_data'
+BUDGET_DATA_SHARD_DEPTH = 2
+
+# How many parsed ledgers each worker process keeps in memory
+BUDGET_LEDGER_CACHE_SIZE = 256
+
+# How ledgers are stored on disk: "budget.storage.JsonFileBackend" rewrites
+# the whole file on every save, "budget.storage.JournalBackend" appends
+# changes to a journal and compacts it in the background.
+BUDGET_LEDGER_BACKEND = "budget.storage.JsonFileBackend"
+
+# Journal size (bytes) after which JournalBackend compacts into the snapshot
+BUDGET_JOURNAL_COMPACT_BYTES = 256 * 1024
+
+# update_user_data() waits this long (seconds) for other updates to the same
+# ledger before writing, so they share one fsync'd write
+BUDGET_GROUP_COMMIT_WINDOW = 0.002
+
+# Entries per page on the summary and income list pages
+BUDGET_LEDGER_PAGE_SIZE = 50
+
+
+# Reports (budget/reporting.py)
+
+# Read monthly totals from the BudgetMonthCategoryRollup table
+BUDGET_USE_ROLLUPS = True
+
+# Cached reports (budget/report_cache.py) live until this many seconds
+# pass or the budget changes. They are kept in CACHES above, which every
+# process must share.
+BUDGET_REPORT_CACHE_TIMEOUT = 60 * 60
+
+# Largest number of scenarios accepted by reports/<id>/what_if/batch/
+BUDGET_WHAT_IF_MAX_SCENARIOS = 10000
+
+# Rows fetched from the database and written per chunk by the streamed
+# ledger export (reports/<id>/csv/?detail=1)
+BUDGET_EXPORT_CHUNK_SIZE = 2000
+
+# Largest batch accepted by api/expenses/bulk/
+BUDGET_BULK_EXPENSES_MAX = 50000
+
+# Default page size of api/expenses/ (clients may ask for up to 1000)
+BUDGET_EXPENSE_PAGE_SIZE = 100